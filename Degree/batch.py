@@ -0,0 +1,123 @@
+import csv
+import gc
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+import degrees
+
+
+def main():
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit("Usage: python batch.py directory [pairs.csv] [workers]")
+    directory = sys.argv[1]
+    filename = sys.argv[2] if len(sys.argv) >= 3 else "-"
+    workers = int(sys.argv[3]) if len(sys.argv) == 4 else os.cpu_count()
+
+    # Load data from files into memory
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(directory, cache=True)
+    print("Data loaded.", file=sys.stderr)
+
+    # Answer every pair, streaming one JSON object per line
+    f = sys.stdin if filename == "-" else open(filename, encoding="utf-8")
+    latencies = []
+    start = time.perf_counter()
+    with f:
+        for result in run_batch(read_pairs(f), workers):
+            latencies.append(result["seconds"])
+            print(json.dumps(result), flush=True)
+    elapsed = time.perf_counter() - start
+
+    if latencies:
+        latencies.sort()
+        print(f"{len(latencies)} queries in {elapsed:.3f}s "
+              f"({len(latencies) / elapsed:.1f} queries/s, {workers} workers)",
+              file=sys.stderr)
+        print(f"Latency: mean {statistics.fmean(latencies) * 1000:.2f}ms, "
+              f"p50 {percentile(latencies, 50) * 1000:.2f}ms, "
+              f"p95 {percentile(latencies, 95) * 1000:.2f}ms, "
+              f"max {latencies[-1] * 1000:.2f}ms", file=sys.stderr)
+
+
+def read_pairs(f):
+    """
+    Yields the rows of a CSV file of source,target name pairs,
+    skipping blank lines.
+    """
+    for row in csv.reader(f):
+        if row:
+            yield [name.strip() for name in row]
+
+
+def run_batch(pairs, workers):
+    """
+    Yields the answer to every pair, in input order.
+
+    Answers are computed by a pool of forked workers that share the
+    loaded data copy-on-write, or in this process if forking is not
+    available or only one worker is asked for.
+    """
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        yield from map(answer, pairs)
+        return
+
+    # Move everything loaded so far out of the collector's reach, so that
+    # collections in the workers do not write to (and copy) shared pages
+    gc.freeze()
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        yield from pool.imap(answer, pairs, chunksize=16)
+
+
+def answer(pair):
+    """
+    Resolves a [source, target] pair of names and finds the shortest
+    path between them.
+
+    Returns a dictionary with the names, the degrees of separation and
+    the path (None if not connected), or an error message, along with
+    the seconds taken.
+    """
+    start = time.perf_counter()
+    result = {"source": pair[0], "target": pair[-1]}
+    if len(pair) != 2:
+        result["error"] = "Expected a source and a target name."
+    else:
+        person_ids = [resolve(name) for name in pair]
+        errors = [error for person_id, error in person_ids if error]
+        if errors:
+            result["error"] = " ".join(errors)
+        else:
+            source, target = [person_id for person_id, error in person_ids]
+            path = degrees.bidirectional_shortest_path(source, target)
+            result["degrees"] = None if path is None else len(path)
+            result["path"] = path
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def resolve(name):
+    """
+    Returns a (person_id, error) pair for a name, without prompting:
+    ambiguous names are reported as errors.
+    """
+    if len(degrees.names.get(name.lower(), ())) > 1:
+        return None, f"'{name}' is ambiguous."
+    person_id = degrees.person_id_for_name(name)
+    if person_id is None:
+        return None, f"'{name}' not found."
+    return person_id, None
+
+
+def percentile(values, percent):
+    """Returns the nearest-rank percentile of a sorted list."""
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[index]
+
+
+if __name__ == "__main__":
+    main()
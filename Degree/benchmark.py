@@ -0,0 +1,116 @@
+import random
+import sys
+import time
+
+import degrees
+from util import (Node, StackFrontier, QueueFrontier, FastStackFrontier,
+                  FastQueueFrontier, PriorityFrontier)
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        sys.exit(f"Usage: python benchmark.py {'|'.join(BENCHMARKS)} [args...]")
+    BENCHMARKS[sys.argv[1]](*sys.argv[2:])
+
+
+def frontier(*sizes):
+    """
+    Times a search-like workload on every frontier class: each of n nodes
+    is checked with contains_state before being added, then the frontier
+    is drained.
+    """
+    sizes = [int(size) for size in sizes] or [1000, 2000, 4000, 8000]
+    classes = [
+        ("StackFrontier", StackFrontier),
+        ("QueueFrontier", QueueFrontier),
+        ("FastStackFrontier", FastStackFrontier),
+        ("FastQueueFrontier", FastQueueFrontier),
+        ("PriorityFrontier", lambda: PriorityFrontier(lambda node: node.state))
+    ]
+
+    print(f"{'frontier':<20}" + "".join(f"{size:>12}" for size in sizes))
+    for name, make in classes:
+        timings = []
+        for size in sizes:
+            start = time.perf_counter()
+            frontier = make()
+            for state in range(size):
+                if not frontier.contains_state(state):
+                    frontier.add(Node(state, None, None))
+            while not frontier.empty():
+                frontier.remove()
+            timings.append(time.perf_counter() - start)
+        print(f"{name:<20}" + "".join(f"{t * 1000:>10.1f}ms" for t in timings))
+
+
+def names(directory="large", queries="100"):
+    """
+    Times prefix and fuzzy (2 edits) name lookups against the name index
+    and against a scan over every name, on names with random typos.
+    """
+    degrees.load_data(directory, cache=True)
+    index = degrees.name_index
+    keys = index.keys
+    random.seed(0)
+    samples = random.sample(keys, min(int(queries), len(keys)))
+    letters = "abcdefghijklmnopqrstuvwxyz "
+
+    def typo(name):
+        i = random.randrange(len(name))
+        return name[:i] + random.choice(letters) + name[i + 1:]
+
+    def naive_prefix(prefix, k=10):
+        person_ids = []
+        for name in keys:
+            if name.startswith(prefix):
+                person_ids.extend(sorted(degrees.names[name]))
+        return person_ids[:k]
+
+    def naive_fuzzy(query, max_distance=2, k=10):
+        matches = []
+        for name in keys:
+            distance = edit_distance(query, name)
+            if distance <= max_distance:
+                for person_id in sorted(degrees.names[name]):
+                    matches.append((distance, person_id))
+        return sorted(matches, key=lambda match: match[0])[:k]
+
+    cases = [
+        ("prefix", [name[:max(1, len(name) // 2)] for name in samples],
+         index.prefix, naive_prefix),
+        ("fuzzy", [typo(typo(name)) for name in samples],
+         index.fuzzy, naive_fuzzy)
+    ]
+    print(f"{len(keys)} names, {len(samples)} queries")
+    for name, inputs, indexed, naive in cases:
+        timings = []
+        for lookup in [indexed, naive]:
+            start = time.perf_counter()
+            answers = [lookup(query) for query in inputs]
+            timings.append((time.perf_counter() - start) / len(inputs))
+            if lookup is indexed:
+                expected = answers
+            elif answers != expected:
+                print(f"{name}: index and scan disagree")
+        print(f"{name:<8} index {timings[0] * 1000:.3f}ms, "
+              f"scan {timings[1] * 1000:.3f}ms per query")
+
+
+def edit_distance(a, b):
+    """Returns the Levenshtein distance between two strings."""
+    row = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        above, row = row, [i]
+        for j, y in enumerate(b, 1):
+            row.append(min(row[j - 1] + 1, above[j] + 1, above[j - 1] + (x != y)))
+    return row[-1]
+
+
+BENCHMARKS = {
+    "frontier": frontier,
+    "names": names
+}
+
+
+if __name__ == "__main__":
+    main()
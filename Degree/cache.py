@@ -0,0 +1,68 @@
+from collections import OrderedDict
+
+
+class PathCache():
+    """
+    Least recently used cache of shortest path results,
+    keyed by (source, target) person ids.
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, source, target):
+        """
+        Returns (True, path) if a result is cached for the pair,
+        where path may be None for unconnected people, or (False, None).
+        """
+        key = (source, target)
+        if key not in self.entries:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return True, self.entries[key]
+
+    def store(self, source, target, path):
+        """Caches the result for a pair, evicting the oldest one if full."""
+        self.entries[(source, target)] = path
+        self.entries.move_to_end((source, target))
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def invalidate(self, touched):
+        """
+        Evicts the results that new links may have changed, given the set
+        of person ids that gained a co-star. Returns how many were evicted.
+
+        Links are only ever added, so cached paths stay valid and can only
+        stop being shortest. A path of length d can only be beaten by one
+        of length d - 1 or less through a new edge, which for d <= 3 must
+        start or end at a touched person:
+          - length 0 or 1 can never be beaten,
+          - length 2 only by a direct new edge, so both ends are touched,
+          - length 3 only by a path of length 2 or 1, so an end is touched,
+          - longer paths and unconnected pairs are always evicted.
+        """
+        if not touched:
+            return 0
+        stale = []
+        for (source, target), path in self.entries.items():
+            if path is None or len(path) > 3:
+                stale.append((source, target))
+            elif len(path) == 3 and (source in touched or target in touched):
+                stale.append((source, target))
+            elif len(path) == 2 and source in touched and target in touched:
+                stale.append((source, target))
+        for key in stale:
+            del self.entries[key]
+        return len(stale)
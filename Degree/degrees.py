@@ -1,7 +1,13 @@
 import csv
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+import snapshot
+import updates
+from cache import PathCache
+from graph import CSRGraph
+from nameindex import NameIndex
+from tables import NameTable
+from util import Node, FastQueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,20 +18,64 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact star graph, used instead of the movies/stars sets when loaded
+graph = None
 
-def load_data(directory):
+# Sorted index of names for prefix and fuzzy lookups
+name_index = None
+
+# Recently asked shortest paths, see cached_shortest_path
+results = PathCache()
+
+
+def load_data(directory, compact=False, cache=False):
+    """
+    Load data from CSV files into memory, and index the names.
+
+    If compact is set, people and movies only keep their metadata
+    and the star links are stored in a CSRGraph instead.
+
+    If cache is set, the data is loaded in compact form from a binary
+    snapshot next to the CSV files, which is (re)written whenever it is
+    missing or older than the CSV files. People, movies and names then
+    read their entries from the snapshot as they are looked up.
     """
-    Load data from CSV files into memory.
+    global name_index
+    results.clear()
+    load_tables(directory, compact, cache)
+    if isinstance(names, NameTable):
+        # a snapshot keeps its names sorted already, but not the names
+        # its journal added
+        name_index = NameIndex(names, names.table)
+        for name in names.added:
+            name_index.add(name)
+    else:
+        name_index = NameIndex(names)
+
+
+def load_tables(directory, compact, cache):
     """
+    Fills in names, people, movies and graph as described in load_data.
+    """
+    global people, movies, names, graph
+
+    if cache:
+        loaded = snapshot.load(directory)
+        if loaded is not None:
+            people, movies, names, graph = loaded
+            return
+        compact = True
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
             people[row["id"]] = {
                 "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
+                "birth": row["birth"]
             }
+            if not compact:
+                people[row["id"]]["movies"] = set()
             if row["name"].lower() not in names:
                 names[row["name"].lower()] = {row["id"]}
             else:
@@ -37,13 +87,30 @@ def load_data(directory):
         for row in reader:
             movies[row["id"]] = {
                 "title": row["title"],
-                "year": row["year"],
-                "stars": set()
+                "year": row["year"]
             }
+            if not compact:
+                movies[row["id"]]["stars"] = set()
 
     # Load stars
     with open(f"{directory}/stars.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
+        if compact:
+            graph = CSRGraph.from_stars(
+                list(people), list(movies),
+                ((row["person_id"], row["movie_id"]) for row in reader))
+            if cache:
+                try:
+                    snapshot.save(directory, people, movies, names, graph)
+                except OSError:
+                    pass
+
+                # deltas journaled since the CSV files last changed are
+                # not in them, they stay journaled for the new snapshot
+                for delta in snapshot.pending_deltas(directory):
+                    updates.merge_delta(people, movies, names, graph, delta)
+            return
+        graph = None
         for row in reader:
             try:
                 people[row["person_id"]]["movies"].add(row["movie_id"])
@@ -52,6 +119,29 @@ def load_data(directory):
                 pass
 
 
+def apply_delta(delta_directory, directory=None):
+    """
+    Applies the new people, movies and star links in a delta directory
+    (laid out like a dataset, any of the CSV files optional) to the data
+    in memory, evicting the cached results they may have changed.
+
+    If the directory the data was loaded from is given, the delta is also
+    journaled against its snapshot, so cached loads include it.
+
+    Returns the set of person ids that gained a co-star.
+    """
+    delta = updates.read_delta(delta_directory)
+    touched = updates.merge_delta(people, movies, names, graph, delta)
+    for person_id, name, birth in delta["people"]:
+        # people merge_delta skipped as already known have no such name
+        if name.lower() in names:
+            name_index.add(name.lower())
+    results.invalidate(touched)
+    if directory is not None:
+        snapshot.append_journal(directory, delta)
+    return touched
+
+
 def main():
     if len(sys.argv) > 2:
         sys.exit("Usage: python degrees.py [directory]")
@@ -59,7 +149,7 @@ def main():
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(directory, cache=True)
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -69,7 +159,7 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = bidirectional_shortest_path(source, target)
 
     if path is None:
         print("Not connected.")
@@ -91,10 +181,12 @@ def shortest_path(source, target):
 
     If no possible path, returns None.
     """
+    if graph is not None:
+        return graph.shortest_path(source, target)
 
     # initiliazing the start point and the frontier with the source actor
     start = Node(source, None, None)
-    frontier = QueueFrontier()
+    frontier = FastQueueFrontier()
     frontier.add(start)
 
     # initiliazing the explored states to zero, and creating the explored set
@@ -127,6 +219,97 @@ def shortest_path(source, target):
                 frontier.add(child)
 
 
+def bidirectional_shortest_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, growing one search
+    from the source and one from the target until they meet.
+
+    If no possible path, returns None.
+    """
+    if graph is not None:
+        return graph.shortest_path(source, target)
+    if source == target:
+        return []
+
+    # Maps each reached person to the (movie_id, person_id) step that reached
+    # them, one map per side, and keeps the current level of each side
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+
+        # always grow the smaller side by one whole level, the first person
+        # reached by both sides lies on a shortest path
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = expand_level(
+                forward_frontier, forward, backward)
+        else:
+            backward_frontier, meeting = expand_level(
+                backward_frontier, backward, forward)
+
+        if meeting is not None:
+            return join_paths(meeting, forward, backward)
+
+    # one side ran out of people to reach, so there is no connection
+    return None
+
+
+def cached_shortest_path(source, target):
+    """
+    Returns bidirectional_shortest_path(source, target),
+    answering repeated pairs from the results cache.
+    """
+    found, path = results.lookup(source, target)
+    if not found:
+        path = bidirectional_shortest_path(source, target)
+        results.store(source, target, path)
+    return path
+
+
+def expand_level(frontier, parents, others):
+    """
+    Expands every person in the frontier by one step, recording how each
+    new person was reached in parents.
+
+    Returns the next level and the first person already reached by the
+    other side, or None if the two sides have not met yet.
+    """
+    next_frontier = []
+    for person_id in frontier:
+        for movie_id, actor in neighbors_for_person(person_id):
+            if actor in parents:
+                continue
+            parents[actor] = (movie_id, person_id)
+            if actor in others:
+                return next_frontier, actor
+            next_frontier.append(actor)
+    return next_frontier, None
+
+
+def join_paths(meeting, forward, backward):
+    """
+    Joins the source side and the target side parent chains at the meeting
+    person into a list of (movie_id, person_id) pairs from source to target.
+    """
+    path = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, previous = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = previous
+    path.reverse()
+
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, following = backward[person_id]
+        path.append((movie_id, following))
+        person_id = following
+    return path
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
@@ -158,6 +341,8 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -0,0 +1,306 @@
+from array import array
+
+
+class CSRGraph():
+    """
+    Compact representation of who starred in what.
+
+    People and movies are interned to dense integer indices, and both
+    directions of the star relation are stored CSR-style: the movies of
+    person p are person_movies[person_offsets[p]:person_offsets[p + 1]],
+    and the stars of movie m are movie_stars[movie_offsets[m]:movie_offsets[m + 1]].
+
+    People, movies and links added after construction are kept in small
+    overlay maps next to the arrays, see add_star and compacted.
+    """
+
+    def __init__(self, person_ids, movie_ids, person_offsets, person_movies,
+                 movie_offsets, movie_stars, person_index=None, movie_index=None):
+        self.person_ids = person_ids
+        self.movie_ids = movie_ids
+
+        # Maps ids back to indices, a snapshot brings lookups of its own
+        if person_index is None:
+            person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        if movie_index is None:
+            movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        self.person_index = person_index
+        self.movie_index = movie_index
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+        # People and movies covered by the arrays, and links added since
+        self.base_people = len(person_offsets) - 1
+        self.base_movies = len(movie_offsets) - 1
+        self.added_movies = {}
+        self.added_stars = {}
+        self.links = len(movie_stars)
+
+    @classmethod
+    def from_stars(cls, person_ids, movie_ids, stars):
+        """
+        Builds a graph from lists of person and movie ids and an iterable
+        of (person_id, movie_id) star links.
+
+        Links to unknown people or movies and repeated links are skipped.
+        """
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+
+        # intern every link to a pair of indices, dropping duplicates
+        movie_count = len(movie_ids)
+        seen = set()
+        edge_people = array("i")
+        edge_movies = array("i")
+        for person_id, movie_id in stars:
+            person = person_index.get(person_id)
+            movie = movie_index.get(movie_id)
+            if person is None or movie is None:
+                continue
+            key = person * movie_count + movie
+            if key in seen:
+                continue
+            seen.add(key)
+            edge_people.append(person)
+            edge_movies.append(movie)
+
+        person_offsets, person_movies = build_csr(
+            len(person_ids), edge_people, edge_movies)
+        movie_offsets, movie_stars = build_csr(
+            movie_count, edge_movies, edge_people)
+        return cls(list(person_ids), list(movie_ids), person_offsets,
+                   person_movies, movie_offsets, movie_stars)
+
+    def neighbors(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        person = self.person_index[person_id]
+        neighbors = set()
+        for movie in self.movies_of(person):
+            movie_id = self.movie_ids[movie]
+            for star in self.stars_of(movie):
+                neighbors.add((movie_id, self.person_ids[star]))
+        return neighbors
+
+    def movies_of(self, person):
+        """Returns the movie indices of a person index."""
+        movies = ()
+        if person < self.base_people:
+            movies = self.person_movies[
+                self.person_offsets[person]:self.person_offsets[person + 1]]
+        added = self.added_movies.get(person)
+        if added:
+            return [*movies, *added]
+        return movies
+
+    def stars_of(self, movie):
+        """Returns the person indices of a movie index."""
+        stars = ()
+        if movie < self.base_movies:
+            stars = self.movie_stars[
+                self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+        added = self.added_stars.get(movie)
+        if added:
+            return [*stars, *added]
+        return stars
+
+    def patched(self):
+        """Returns whether anything was added since construction."""
+        return (len(self.person_ids) > self.base_people
+                or len(self.movie_ids) > self.base_movies
+                or bool(self.added_movies))
+
+    def add_person(self, person_id):
+        """Adds a person if missing, returning their index."""
+        person = self.person_index.get(person_id)
+        if person is None:
+            person = len(self.person_ids)
+            self.person_ids.append(person_id)
+            self.person_index[person_id] = person
+        return person
+
+    def add_movie(self, movie_id):
+        """Adds a movie if missing, returning its index."""
+        movie = self.movie_index.get(movie_id)
+        if movie is None:
+            movie = len(self.movie_ids)
+            self.movie_ids.append(movie_id)
+            self.movie_index[movie_id] = movie
+        return movie
+
+    def add_star(self, person_id, movie_id):
+        """
+        Links a known person to a known movie.
+
+        Returns False if they were already linked, True otherwise.
+        """
+        person = self.person_index[person_id]
+        movie = self.movie_index[movie_id]
+        if movie in self.movies_of(person):
+            return False
+        self.added_movies.setdefault(person, []).append(movie)
+        self.added_stars.setdefault(movie, []).append(person)
+        self.links += 1
+        return True
+
+    def compacted(self):
+        """Returns a copy of the graph with every added link in its arrays."""
+        stars = (
+            (self.person_ids[person], self.movie_ids[movie])
+            for person in range(len(self.person_ids))
+            for movie in self.movies_of(person)
+        )
+        return CSRGraph.from_stars(self.person_ids, self.movie_ids, stars)
+
+    def shortest_path(self, source, target, bound=None, estimate=None):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target.
+
+        Runs a bidirectional breadth-first search over person indices,
+        recording parents in plain integer maps and expanding every movie
+        at most once per side.
+
+        If bound is an upper bound on the length of the path and
+        estimate(a, b) a lower bound on the distance between two person
+        indices, people who cannot lie on a path within the bound are
+        never added to either frontier.
+
+        If no possible path, returns None.
+        """
+        source = self.person_index[source]
+        target = self.person_index[target]
+        if source == target:
+            return []
+
+        if bound is not None and estimate is not None:
+            def forward_prune(person, depth):
+                return depth + estimate(person, target) > bound
+
+            def backward_prune(person, depth):
+                return depth + estimate(source, person) > bound
+        else:
+            forward_prune = backward_prune = None
+
+        # Per side: the person each person was reached from, the movie that
+        # links them, the movies already expanded, the current level and
+        # its distance from that side's end
+        forward_people = {source: -1}
+        forward_movies = {}
+        forward_seen = set()
+        forward_frontier = [source]
+        forward_depth = 0
+        backward_people = {target: -1}
+        backward_movies = {}
+        backward_seen = set()
+        backward_frontier = [target]
+        backward_depth = 0
+
+        while forward_frontier and backward_frontier:
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_depth += 1
+                forward_frontier, meeting = self.expand_level(
+                    forward_frontier, forward_people, forward_movies,
+                    forward_seen, backward_people, forward_depth,
+                    forward_prune)
+            else:
+                backward_depth += 1
+                backward_frontier, meeting = self.expand_level(
+                    backward_frontier, backward_people, backward_movies,
+                    backward_seen, forward_people, backward_depth,
+                    backward_prune)
+
+            if meeting is not None:
+                return self.join_paths(
+                    meeting, forward_people, forward_movies,
+                    backward_people, backward_movies)
+
+        return None
+
+    def expand_level(self, frontier, parent_people, parent_movies, seen_movies,
+                     others, depth=None, prune=None):
+        """
+        Expands every person index in the frontier by one step, skipping
+        people for whom prune(person, depth) is true.
+
+        Returns the next level and the first person index already reached
+        by the other side, or None if the two sides have not met yet.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+
+        # read the arrays directly unless there are added links to merge in
+        if self.patched():
+            movies_of = self.movies_of
+            stars_of = self.stars_of
+        else:
+            def movies_of(person):
+                return person_movies[person_offsets[person]:person_offsets[person + 1]]
+
+            def stars_of(movie):
+                return movie_stars[movie_offsets[movie]:movie_offsets[movie + 1]]
+
+        next_frontier = []
+        for person in frontier:
+            for movie in movies_of(person):
+                if movie in seen_movies:
+                    continue
+                seen_movies.add(movie)
+                for star in stars_of(movie):
+                    if star in parent_people:
+                        continue
+                    if prune is not None and prune(star, depth):
+                        continue
+                    parent_people[star] = person
+                    parent_movies[star] = movie
+                    if star in others:
+                        return next_frontier, star
+                    next_frontier.append(star)
+        return next_frontier, None
+
+    def join_paths(self, meeting, forward_people, forward_movies,
+                   backward_people, backward_movies):
+        """
+        Joins both parent chains at the meeting person index into a list of
+        (movie_id, person_id) pairs from source to target.
+        """
+        path = []
+        person = meeting
+        while forward_people[person] != -1:
+            path.append((self.movie_ids[forward_movies[person]],
+                         self.person_ids[person]))
+            person = forward_people[person]
+        path.reverse()
+
+        person = meeting
+        while backward_people[person] != -1:
+            following = backward_people[person]
+            path.append((self.movie_ids[backward_movies[person]],
+                         self.person_ids[following]))
+            person = following
+        return path
+
+
+def build_csr(size, rows, columns):
+    """
+    Counting-sorts parallel arrays of row and column indices into
+    CSR offsets (size + 1 entries) and a flat column array.
+    """
+    offsets = array("i", bytes(4 * (size + 1)))
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    cursor = array("i", offsets)
+    flat = array("i", bytes(4 * len(rows)))
+    for row, column in zip(rows, columns):
+        flat[cursor[row]] = column
+        cursor[row] += 1
+    return offsets, flat
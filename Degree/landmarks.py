@@ -0,0 +1,250 @@
+import csv
+import math
+import os
+import pickle
+import sys
+import time
+from array import array
+
+import degrees
+from batch import resolve
+
+# Bump whenever the file layout changes, older indexes are then rebuilt
+VERSION = 2
+
+FILENAME = "landmarks.index"
+UNREACHABLE = 0xFFFF
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[2] not in ["build", "query"]:
+        sys.exit("Usage: python landmarks.py directory build [landmarks]\n"
+                 "       python landmarks.py directory query [pairs.csv]")
+    directory = sys.argv[1]
+
+    # Load data from files into memory
+    print("Loading data...")
+    degrees.load_data(directory, cache=True)
+    print("Data loaded.")
+
+    if sys.argv[2] == "build":
+        count = int(sys.argv[3]) if len(sys.argv) == 4 else 16
+        start = time.perf_counter()
+        index = LandmarkIndex.build(degrees.graph, count, verbose=True)
+        print(f"Built {len(index.landmarks)} landmarks "
+              f"in {time.perf_counter() - start:.3f}s.")
+        index.save(os.path.join(directory, FILENAME))
+        return
+
+    index = LandmarkIndex.load(os.path.join(directory, FILENAME), degrees.graph)
+    if index is None:
+        sys.exit("No landmark index, run build first.")
+
+    # Estimate every pair of names, then report the overall query rate
+    f = sys.stdin if len(sys.argv) == 3 else open(sys.argv[3], encoding="utf-8")
+    queries = 0
+    elapsed = 0
+    with f:
+        for row in csv.reader(f):
+            if len(row) != 2:
+                continue
+            (source, error), (target, other_error) = [
+                resolve(name.strip()) for name in row]
+            if error or other_error:
+                print(f"{row[0]}, {row[1]}: {error or other_error}")
+                continue
+            start = time.perf_counter()
+            lower, upper = index.bounds(source, target)
+            elapsed += time.perf_counter() - start
+            queries += 1
+            if lower == math.inf:
+                print(f"{row[0]}, {row[1]}: not connected")
+            else:
+                print(f"{row[0]}, {row[1]}: between {lower} and {upper} degrees")
+    if queries:
+        print(f"{queries} estimates in {elapsed * 1000:.3f}ms "
+              f"({elapsed / queries * 1e6:.2f}us each)")
+
+
+class LandmarkIndex():
+    """
+    Distances from a few well-connected landmark people to everybody else.
+
+    For any landmark L the triangle inequality gives
+    |d(L, s) - d(L, t)| <= d(s, t) <= d(L, s) + d(L, t),
+    so the degree of separation between two people can be bounded
+    in time proportional to the number of landmarks.
+
+    Adding links to the graph can shorten distances, so an index must be
+    rebuilt after a delta is applied.
+    """
+
+    def __init__(self, graph, landmarks, distances):
+        self.graph = graph
+        self.landmarks = landmarks
+        self.distances = distances
+
+    @classmethod
+    def build(cls, graph, count=16, verbose=False):
+        """
+        Picks up to count landmarks among the people with the most co-stars,
+        skipping anyone next to an existing landmark, and runs a
+        breadth-first search from each of them.
+        """
+        co_stars = [
+            sum(len(graph.stars_of(movie)) - 1 for movie in graph.movies_of(person))
+            for person in range(len(graph.person_ids))
+        ]
+        candidates = sorted(
+            range(len(co_stars)), key=co_stars.__getitem__, reverse=True)
+
+        landmarks = []
+        distances = []
+        for person in candidates:
+            if len(landmarks) == count or co_stars[person] == 0:
+                break
+            if any(d[person] <= 1 for d in distances):
+                continue
+            start = time.perf_counter()
+            landmarks.append(person)
+            distances.append(distances_from(graph, person))
+            if verbose:
+                print(f"Landmark {graph.person_ids[person]} "
+                      f"({co_stars[person]} co-stars) "
+                      f"in {time.perf_counter() - start:.3f}s")
+        return cls(graph, landmarks, distances)
+
+    @classmethod
+    def load(cls, path, graph):
+        """
+        Loads an index saved for the given graph,
+        or returns None if there is none or it is out of date.
+        """
+        try:
+            with open(path, "rb") as f:
+                saved = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if (saved["version"] != VERSION
+                or saved["people"] != len(graph.person_ids)
+                or saved["links"] != graph.links
+                or any(graph.person_index.get(person_id) is None
+                       for person_id in saved["landmarks"])):
+            return None
+        landmarks = [graph.person_index[person_id]
+                     for person_id in saved["landmarks"]]
+        return cls(graph, landmarks, saved["distances"])
+
+    def save(self, path):
+        """Saves the index, keyed by person id so it survives reloading."""
+        with open(path, "wb") as f:
+            pickle.dump({
+                "version": VERSION,
+                "people": len(self.graph.person_ids),
+                "links": self.graph.links,
+                "landmarks": [self.graph.person_ids[person]
+                              for person in self.landmarks],
+                "distances": self.distances
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation
+        between two person ids, using math.inf where there is no bound
+        (a lower bound of math.inf means they are not connected).
+        """
+        index = self.graph.person_index
+        return self.index_bounds(index[source], index[target])
+
+    def index_bounds(self, source, target):
+        """Returns the bounds between two person indices."""
+        if source == target:
+            return 0, 0
+        lower = 0
+        upper = math.inf
+        for distances in self.distances:
+            d_source = distances[source]
+            d_target = distances[target]
+            if d_source == UNREACHABLE and d_target == UNREACHABLE:
+                continue
+            if d_source == UNREACHABLE or d_target == UNREACHABLE:
+                return math.inf, math.inf
+            lower = max(lower, abs(d_source - d_target))
+            upper = min(upper, d_source + d_target)
+        return lower, upper
+
+    def shortest_path(self, source, target, active=2):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target.
+
+        Pairs the landmarks prove unconnected are answered at once,
+        otherwise the search is bounded by the upper bound and pruned
+        with the lower bounds of the active landmarks that best separate
+        the source from the target.
+
+        If no possible path, returns None.
+        """
+        lower, upper = self.bounds(source, target)
+        if lower == math.inf:
+            return None
+        if upper == math.inf:
+            return self.graph.shortest_path(source, target)
+
+        # Keep the landmarks that see both ends and separate them best, and
+        # the distance from each of them to either end of the search
+        s = self.graph.person_index[source]
+        t = self.graph.person_index[target]
+        best = sorted(
+            (d for d in self.distances if d[s] != UNREACHABLE),
+            key=lambda d: abs(d[s] - d[t]), reverse=True)[:active]
+        to_source = [(d, d[s]) for d in best]
+        to_target = [(d, d[t]) for d in best]
+
+        def estimate(a, b):
+            if b == t:
+                person, ends = a, to_target
+            else:
+                person, ends = b, to_source
+            lower = 0
+            for distances, d_end in ends:
+                d_person = distances[person]
+                if d_person == UNREACHABLE:
+                    return math.inf
+                if d_person - d_end > lower:
+                    lower = d_person - d_end
+                elif d_end - d_person > lower:
+                    lower = d_end - d_person
+            return lower
+
+        return self.graph.shortest_path(source, target, upper, estimate)
+
+
+def distances_from(graph, source):
+    """
+    Returns an array of the degrees of separation from the source person
+    index to every person index, UNREACHABLE where there is no path.
+    """
+    distances = array("H", [UNREACHABLE]) * len(graph.person_ids)
+    seen = bytearray(len(graph.movie_ids))
+    distances[source] = 0
+    frontier = [source]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for person in frontier:
+            for movie in graph.movies_of(person):
+                if seen[movie]:
+                    continue
+                seen[movie] = 1
+                for star in graph.stars_of(movie):
+                    if distances[star] == UNREACHABLE:
+                        distances[star] = depth
+                        next_frontier.append(star)
+        frontier = next_frontier
+    return distances
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import heapq
+import time
+from bisect import bisect_left, bisect_right
+
+# Sorts after every character, so key + LAST bounds all keys with that prefix
+LAST = chr(0x10FFFF)
+
+
+class NameIndex():
+    """
+    Sorted list of the lowercase names in a names dictionary
+    (name -> set of person_ids), for prefix and fuzzy lookups.
+
+    Keys sharing a prefix are adjacent once sorted, so the list doubles
+    as an implicit trie: a prefix is a range found by bisection, and a
+    fuzzy search can skip every name under a prefix that is already too
+    far from the query.
+
+    The names may come already sorted as keys, any sequence, which is
+    copied to a list the first time a name is added.
+    """
+
+    def __init__(self, names, keys=None):
+        self.names = names
+        self.keys = sorted(names) if keys is None else keys
+
+    def add(self, name):
+        """Adds a lowercase name, if not already present."""
+        if not isinstance(self.keys, list):
+            self.keys = list(self.keys)
+        i = bisect_left(self.keys, name)
+        if i == len(self.keys) or self.keys[i] != name:
+            self.keys.insert(i, name)
+
+    def prefix(self, prefix, k=10):
+        """
+        Returns up to k person_ids whose names start with prefix,
+        in alphabetical order of name.
+        """
+        prefix = prefix.lower()
+        start = bisect_left(self.keys, prefix)
+        end = bisect_right(self.keys, prefix + LAST, lo=start)
+        person_ids = []
+        for name in self.keys[start:end]:
+            person_ids.extend(sorted(self.names[name]))
+            if len(person_ids) >= k:
+                break
+        return person_ids[:k]
+
+    def fuzzy(self, query, max_distance=2, k=10, budget=None):
+        """
+        Returns up to k (distance, person_id) pairs for the names within
+        max_distance edits (Levenshtein distance) of the query, closest
+        first, then in alphabetical order of name.
+
+        If budget is given, the search stops after that many seconds and
+        returns the best names found so far.
+        """
+        query = query.lower()
+        deadline = None if budget is None else time.perf_counter() + budget
+        keys = self.keys
+
+        # rows[j] is the edit distance row of the first j characters of the
+        # current key against every prefix of the query, and is shared with
+        # the next key for as long as the two keys share characters; only
+        # the band of cells within max_distance of the diagonal can be that
+        # close, the others are capped just above it
+        cap = max_distance + 1
+        width = len(query)
+        rows = [[min(column, cap) for column in range(width + 1)]]
+        previous = ""
+
+        # max-heap (through negation) of the k best (distance, name)
+        best = []
+        bound = max_distance
+
+        i = 0
+        visited = 0
+        while i < len(keys):
+            visited += 1
+            if deadline is not None and visited % 256 == 0 and time.perf_counter() > deadline:
+                break
+            key = keys[i]
+
+            shared = 0
+            limit = min(len(key), len(previous), len(rows) - 1)
+            while shared < limit and key[shared] == previous[shared]:
+                shared += 1
+            del rows[shared + 1:]
+
+            # extend the rows one character at a time, skipping the
+            # whole prefix range once no extension can come within bound
+            skipped = False
+            for j in range(shared, len(key)):
+                above = rows[j]
+                row = [cap] * (width + 1)
+                row[0] = min(j + 1, cap)
+                character = key[j]
+                for column in range(max(1, j + 1 - max_distance),
+                                    min(width, j + 1 + max_distance) + 1):
+                    value = above[column - 1] + (query[column - 1] != character)
+                    if above[column] < value:
+                        value = above[column] + 1
+                    if row[column - 1] < value:
+                        value = row[column - 1] + 1
+                    row[column] = min(value, cap)
+                rows.append(row)
+                if min(row) > bound:
+                    i = bisect_right(keys, key[:j + 1] + LAST, lo=i)
+                    previous = key
+                    skipped = True
+                    break
+            if skipped:
+                continue
+
+            distance = rows[len(key)][-1]
+            if distance <= bound:
+                heapq.heappush(best, (-distance, Reversed(key)))
+                if len(best) > k:
+                    heapq.heappop(best)
+                if len(best) == k:
+                    bound = min(bound, -best[0][0])
+            previous = key
+            i += 1
+
+        matches = []
+        for negated, key in sorted(best, key=lambda entry: (-entry[0], entry[1].key)):
+            for person_id in sorted(self.names[key.key]):
+                matches.append((-negated, person_id))
+        return matches[:k]
+
+
+class Reversed():
+    """Wraps a string so that heapq keeps the alphabetically last on top."""
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return self.key > other.key
@@ -0,0 +1,192 @@
+import asyncio
+import collections
+import gc
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import degrees
+from batch import percentile, resolve
+
+
+def main():
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit("Usage: python server.py directory [port] [workers]")
+    directory = sys.argv[1]
+    port = int(sys.argv[2]) if len(sys.argv) >= 3 else 8050
+    workers = int(sys.argv[3]) if len(sys.argv) == 4 else os.cpu_count()
+
+    # Load data from files into memory
+    print("Loading data...")
+    degrees.load_data(directory, cache=True)
+    print("Data loaded.")
+
+    # Fork the workers before the event loop starts, sharing the data, or
+    # search in a thread of this process if forking is not available
+    if "fork" in multiprocessing.get_all_start_methods():
+        gc.freeze()
+        executor = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("fork"))
+        list(executor.map(abs, range(workers)))
+    else:
+        executor = ThreadPoolExecutor(1)
+
+    server = DegreesServer(executor)
+    try:
+        asyncio.run(server.serve(port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown()
+
+
+class DegreesServer():
+    """
+    HTTP service answering shortest path queries over the loaded data.
+
+    GET /path?source=NAME&target=NAME answers a query, and GET /metrics
+    reports cache and latency statistics. Searches run in the worker
+    pool so the event loop keeps serving, repeated pairs are answered
+    from degrees.results, and concurrent requests for the same pair
+    share a single search.
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.pending = {}
+        self.requests = 0
+        self.errors = 0
+        self.latencies = collections.deque(maxlen=10000)
+
+    async def serve(self, port):
+        server = await asyncio.start_server(self.handle, port=port)
+        print(f"Serving on port {port}.")
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        """Answers a single HTTP request, then closes the connection."""
+        try:
+            try:
+                request = await reader.readline()
+                while (await reader.readline()).strip():
+                    pass
+            except ValueError:
+                # a line longer than the limit of the stream
+                status, body = "400 Bad Request", {"error": "Request too long."}
+            else:
+                try:
+                    status, body = await self.respond(request.decode("latin-1"))
+                except Exception as e:
+                    # such as a worker pool broken by a dead worker
+                    self.errors += 1
+                    status, body = "500 Internal Server Error", {
+                        "error": f"Search failed: {type(e).__name__}."}
+
+            data = json.dumps(body).encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                "Connection: close\r\n\r\n".encode("latin-1") + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, request):
+        """Returns the (status, JSON body) for a request line."""
+        parts = request.split()
+        if len(parts) != 3 or parts[0] != "GET":
+            return "405 Method Not Allowed", {"error": "Only GET is supported."}
+        url = urlsplit(parts[1])
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/metrics":
+            return "200 OK", self.metrics()
+        if url.path != "/path":
+            return "404 Not Found", {"error": f"No such endpoint {url.path}."}
+        if "source" not in query or "target" not in query:
+            return "400 Bad Request", {"error": "Need a source and a target."}
+
+        self.requests += 1
+        start = time.perf_counter()
+        (source, error), (target, other_error) = [
+            resolve(query[key]) for key in ["source", "target"]]
+        if error or other_error:
+            self.errors += 1
+            return "404 Not Found", {"error": error or other_error}
+
+        found, path = degrees.results.lookup(source, target)
+        if not found:
+            path = await self.search(source, target)
+        seconds = time.perf_counter() - start
+        self.latencies.append(seconds)
+        return "200 OK", {
+            "source": source,
+            "target": target,
+            "degrees": None if path is None else len(path),
+            "path": None if path is None else [
+                {
+                    "movie_id": movie_id,
+                    "title": degrees.movies[movie_id]["title"],
+                    "person_id": person_id,
+                    "name": degrees.people[person_id]["name"]
+                }
+                for movie_id, person_id in path
+            ],
+            "cached": found,
+            "seconds": seconds
+        }
+
+    async def search(self, source, target):
+        """
+        Finds the path between two people in the worker pool and caches
+        it, joining the search already running for that pair if any.
+        """
+        key = (source, target)
+        if key not in self.pending:
+            loop = asyncio.get_running_loop()
+            self.pending[key] = loop.run_in_executor(
+                self.executor, degrees.bidirectional_shortest_path,
+                source, target)
+        future = self.pending[key]
+        try:
+            path = await future
+        finally:
+            self.pending.pop(key, None)
+        degrees.results.store(source, target, path)
+        return path
+
+    def metrics(self):
+        """Returns request, cache and latency statistics."""
+        results = degrees.results
+        latencies = sorted(self.latencies)
+        lookups = results.hits + results.misses
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "cache": {
+                "size": len(results),
+                "hits": results.hits,
+                "misses": results.misses,
+                "hit_rate": results.hits / lookups if lookups else None
+            },
+            "latency_ms": {
+                "samples": len(latencies),
+                "mean": statistics.fmean(latencies) * 1000 if latencies else None,
+                "p50": percentile(latencies, 50) * 1000 if latencies else None,
+                "p95": percentile(latencies, 95) * 1000 if latencies else None,
+                "p99": percentile(latencies, 99) * 1000 if latencies else None
+            }
+        }
+
+
+if __name__ == "__main__":
+    main()
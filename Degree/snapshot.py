@@ -0,0 +1,266 @@
+import mmap
+import os
+import pickle
+import struct
+import sys
+
+from graph import CSRGraph
+from tables import NameTable, Rows, StringTable, TableIndex
+from updates import merge_delta
+
+# Bump whenever the file layout changes, older snapshots are then rebuilt
+VERSION = 3
+
+FILENAME = "degrees.snapshot"
+JOURNAL = "degrees.snapshot.journal"
+MAGIC = b"DEGSNAP\0"
+PREAMBLE = struct.Struct("<8sI4x")
+TRAILER = struct.Struct("<Q")
+SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+ARRAYS = ["person_offsets", "person_movies", "movie_offsets", "movie_stars"]
+
+# Int arrays indexing the metadata, kept next to its string tables
+INDEXES = ["person_order", "movie_order", "name_offsets", "name_people"]
+
+
+def snapshot_path(directory):
+    """Returns the path of the snapshot kept next to a dataset's CSV files."""
+    return os.path.join(directory, FILENAME)
+
+
+def journal_path(directory):
+    """
+    Returns the path of the journal of deltas applied to a dataset's
+    snapshot since it was written.
+    """
+    return os.path.join(directory, JOURNAL)
+
+
+def source_stamps(directory):
+    """
+    Returns the (mtime, size) of every CSV file in a dataset,
+    a snapshot is only valid while these stay the same.
+    """
+    stamps = {}
+    for name in SOURCES:
+        stat = os.stat(os.path.join(directory, name))
+        stamps[name] = (stat.st_mtime_ns, stat.st_size)
+    return stamps
+
+
+def save(directory, people, movies, names, graph):
+    """
+    Writes the dataset loaded from the CSV files, without any delta, to a
+    binary snapshot next to them.
+
+    The file holds the raw CSR arrays of the graph and the metadata as
+    flat int arrays and string tables, each aligned to 8 bytes so they can
+    be memory-mapped back, followed by a header describing where
+    everything lives.
+
+    Deltas journaled since the CSV files last changed stay journaled,
+    against the new snapshot, see pending_deltas.
+    """
+    person_ids = list(graph.person_ids)
+    movie_ids = list(graph.movie_ids)
+    name_keys, name_offsets, name_people = NameTable.pack(
+        names, graph.person_index)
+    contents = {name: getattr(graph, name) for name in ARRAYS}
+    contents.update({
+        "person_order": TableIndex.pack(person_ids),
+        "movie_order": TableIndex.pack(movie_ids),
+        "name_offsets": name_offsets,
+        "name_people": name_people
+    })
+    tables = {
+        "person_ids": person_ids,
+        "movie_ids": movie_ids,
+        "names": [people[person_id]["name"] for person_id in person_ids],
+        "births": [people[person_id]["birth"] for person_id in person_ids],
+        "titles": [movies[movie_id]["title"] for movie_id in movie_ids],
+        "years": [movies[movie_id]["year"] for movie_id in movie_ids],
+        "name_keys": name_keys
+    }
+    for name, strings in tables.items():
+        contents[f"{name}_offsets"], contents[name] = StringTable.pack(strings)
+
+    path = snapshot_path(directory)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    sections = {}
+    with open(temporary, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION))
+        for name, content in contents.items():
+            data = memoryview(content).cast("B")
+            sections[name] = (f.tell(), len(data))
+            f.write(data)
+            f.write(bytes(-f.tell() % 8))
+
+        header = {
+            "version": VERSION,
+            "id": os.urandom(8).hex(),
+            "byteorder": sys.byteorder,
+            "itemsize": memoryview(graph.person_offsets).itemsize,
+            "sources": source_stamps(directory),
+            "sections": sections
+        }
+        offset = f.tell()
+        f.write(pickle.dumps(header, protocol=pickle.HIGHEST_PROTOCOL))
+        f.write(TRAILER.pack(offset))
+
+    # replace atomically so a concurrent reader never sees half a snapshot
+    deltas = pending_deltas(directory)
+    os.replace(temporary, path)
+    if deltas:
+        write_journal(directory, header, deltas)
+    else:
+        try:
+            os.remove(journal_path(directory))
+        except FileNotFoundError:
+            pass
+
+
+def write_journal(directory, header, deltas=()):
+    """
+    Replaces the journal of a dataset with one against the snapshot with
+    the given header, holding the given deltas.
+    """
+    path = journal_path(directory)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        pickle.dump({"id": header["id"], "sources": header["sources"]}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+        for delta in deltas:
+            pickle.dump(delta, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+
+
+def append_journal(directory, delta):
+    """
+    Records a delta against a dataset's snapshot, so that it is replayed
+    whenever the snapshot is loaded until the CSV files change.
+
+    Returns False if there is no valid snapshot to record it against.
+    """
+    header = read_header(directory)
+    if header is None:
+        return False
+    if read_journal(directory, header["id"]) is None:
+        write_journal(directory, header)
+    with open(journal_path(directory), "ab") as f:
+        pickle.dump(delta, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return True
+
+
+def read_journal(directory, snapshot_id):
+    """
+    Returns the list of deltas journaled against the snapshot with the
+    given id, or None if there is no journal for it.
+    """
+    journal = load_journal(directory)
+    if journal is None or journal[0]["id"] != snapshot_id:
+        return None
+    return journal[1]
+
+
+def pending_deltas(directory):
+    """
+    Returns the list of deltas journaled since the CSV files of a dataset
+    last changed, whichever snapshot they were journaled against: a
+    snapshot rebuilt from the same CSV files still lacks them.
+    """
+    journal = load_journal(directory)
+    if journal is None or journal[0]["sources"] != source_stamps(directory):
+        return []
+    return journal[1]
+
+
+def load_journal(directory):
+    """
+    Returns (owner, deltas) for the journal of a dataset, owner holding
+    the id and source stamps of the snapshot it was written against, or
+    None if there is no readable journal.
+    """
+    deltas = []
+    try:
+        with open(journal_path(directory), "rb") as f:
+            owner = pickle.load(f)
+            if not isinstance(owner, dict):
+                return None
+
+            # a delta cut short by a crash mid-append ends the journal
+            while True:
+                try:
+                    deltas.append(pickle.load(f))
+                except (EOFError, pickle.UnpicklingError):
+                    return owner, deltas
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def read_header(directory, view=None):
+    """
+    Returns the header of a dataset's snapshot (reading it from the mapped
+    view if given), or None if there is no snapshot or it is out of date
+    with the CSV files.
+    """
+    try:
+        if view is None:
+            with open(snapshot_path(directory), "rb") as f:
+                view = memoryview(
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        magic, version = PREAMBLE.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            return None
+        offset, = TRAILER.unpack_from(view, len(view) - TRAILER.size)
+        header = pickle.loads(view[offset:len(view) - TRAILER.size])
+    except (OSError, ValueError, struct.error, pickle.UnpicklingError, EOFError):
+        return None
+    if (header["byteorder"] != sys.byteorder
+            or header["itemsize"] != struct.calcsize("i")
+            or header["sources"] != source_stamps(directory)):
+        return None
+    return header
+
+
+def load(directory):
+    """
+    Memory-maps the snapshot of a dataset and replays its journal.
+
+    Returns (people, movies, names, graph), all backed directly by the
+    mapped file, or None if there is no snapshot or it is out of date
+    with the CSV files. People, movies and names are mappings that read
+    an entry from the file the first time it is asked for, see tables.py.
+    """
+    try:
+        with open(snapshot_path(directory), "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    view = memoryview(buffer)
+    header = read_header(directory, view)
+    if header is None:
+        return None
+
+    def section(name):
+        start, length = header["sections"][name]
+        return view[start:start + length]
+
+    def table(name):
+        return StringTable(section(f"{name}_offsets").cast("q"), section(name))
+
+    arrays = {name: section(name).cast("i") for name in ARRAYS + INDEXES}
+    person_ids = table("person_ids")
+    movie_ids = table("movie_ids")
+    person_index = TableIndex(person_ids, arrays["person_order"])
+    movie_index = TableIndex(movie_ids, arrays["movie_order"])
+    graph = CSRGraph(person_ids, movie_ids,
+                     *[arrays[name] for name in ARRAYS],
+                     person_index, movie_index)
+    people = Rows(person_index, {"name": table("names"), "birth": table("births")})
+    movies = Rows(movie_index, {"title": table("titles"), "year": table("years")})
+    names = NameTable(table("name_keys"), arrays["name_offsets"],
+                      arrays["name_people"], person_ids)
+    for delta in read_journal(directory, header["id"]) or []:
+        merge_delta(people, movies, names, graph, delta)
+    return people, movies, names, graph
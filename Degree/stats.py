@@ -0,0 +1,222 @@
+import csv
+import gc
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+import degrees
+
+# Sources searched together, one bit of a machine word each
+WORD = 64
+
+# Flat NumPy views of the loaded graph, shared with forked workers
+arrays = None
+
+
+def main():
+    if len(sys.argv) not in [2, 3, 4, 5]:
+        sys.exit("Usage: python stats.py directory [output.csv] [sample] [workers]")
+    directory = sys.argv[1]
+    output = sys.argv[2] if len(sys.argv) >= 3 else None
+    sample = int(sys.argv[3]) if len(sys.argv) >= 4 else None
+    workers = int(sys.argv[4]) if len(sys.argv) == 5 else os.cpu_count()
+
+    # Load data from files into memory
+    print("Loading data...")
+    degrees.load_data(directory, cache=True)
+    print("Data loaded.")
+
+    # deltas applied since the snapshot was written live outside the arrays
+    global arrays
+    if degrees.graph.patched():
+        degrees.graph = degrees.graph.compacted()
+    arrays = graph_arrays(degrees.graph)
+
+    # Search from every connected person, or from a random sample of them
+    sources = np.flatnonzero(arrays["co_stars"]).tolist()
+    if sample is not None and sample < len(sources):
+        sources = sorted(random.sample(sources, sample))
+
+    start = time.perf_counter()
+    results = separation_stats(sources, workers)
+    elapsed = time.perf_counter() - start
+    print(f"Searched from {len(sources)} people in {elapsed:.3f}s "
+          f"({len(sources) / elapsed:.1f} people/s, {workers} workers)")
+
+    histogram = results["histogram"]
+    total = histogram.sum()
+    print("Degrees of separation between connected pairs:")
+    for distance in range(1, len(histogram)):
+        if histogram[distance]:
+            print(f"  {distance}: {histogram[distance]} "
+                  f"({histogram[distance] / total:.2%})")
+    if total:
+        mean = (histogram * np.arange(len(histogram))).sum() / total
+        print(f"  mean: {mean:.3f}")
+
+    print("Co-stars per person:")
+    co_stars = arrays["co_stars"]
+    bins = [0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+    counts = np.histogram(co_stars, bins=bins + [max(co_stars.max(), 1000) + 1])[0]
+    for low, count in zip(bins, counts):
+        print(f"  {low}+: {count}")
+
+    if output:
+        write_people(output, sources, results)
+        print(f"Per person statistics written to {output}.")
+
+
+def graph_arrays(graph):
+    """
+    Returns NumPy views of a CSRGraph's arrays, the segment starts of the
+    people and movies with at least one link (as needed by reduceat), and
+    the number of co-star links of every person.
+    """
+    person_offsets = np.frombuffer(graph.person_offsets, dtype=np.intc)
+    movie_offsets = np.frombuffer(graph.movie_offsets, dtype=np.intc)
+    person_movies = np.frombuffer(graph.person_movies, dtype=np.intc)
+    movie_stars = np.frombuffer(graph.movie_stars, dtype=np.intc)
+
+    linked_people = np.flatnonzero(np.diff(person_offsets))
+    linked_movies = np.flatnonzero(np.diff(movie_offsets))
+    movie_sizes = np.diff(movie_offsets).astype(np.int64)
+    co_stars = np.zeros(len(person_offsets) - 1, dtype=np.int64)
+    if len(person_movies):
+        co_stars[linked_people] = np.add.reduceat(
+            movie_sizes[person_movies] - 1, person_offsets[linked_people])
+
+    return {
+        "people": len(person_offsets) - 1,
+        "movies": len(movie_offsets) - 1,
+        "person_movies": person_movies,
+        "movie_stars": movie_stars,
+        "linked_people": linked_people,
+        "person_starts": person_offsets[linked_people],
+        "linked_movies": linked_movies,
+        "movie_starts": movie_offsets[linked_movies],
+        "co_stars": co_stars
+    }
+
+
+def separation_stats(sources, workers):
+    """
+    Runs a breadth-first search from every source person index, WORD
+    sources at a time, spread over a pool of forked workers.
+
+    Returns a dictionary of per-source arrays (reachable people, total
+    distance, eccentricity) in the order of sources, and the histogram of
+    distances over all pairs found.
+    """
+    batches = [sources[i:i + WORD] for i in range(0, len(sources), WORD)]
+    results = {
+        "reachable": np.zeros(len(sources), dtype=np.int64),
+        "distance": np.zeros(len(sources), dtype=np.int64),
+        "eccentricity": np.zeros(len(sources), dtype=np.int64),
+        "histogram": np.zeros(1, dtype=np.int64)
+    }
+
+    def collect(i, batch):
+        start = i * WORD
+        for name in ["reachable", "distance", "eccentricity"]:
+            results[name][start:start + len(batch[name])] = batch[name]
+        histogram = batch["histogram"]
+        if len(histogram) > len(results["histogram"]):
+            results["histogram"] = np.pad(
+                results["histogram"], (0, len(histogram) - len(results["histogram"])))
+        results["histogram"][:len(histogram)] += histogram
+
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        for i, batch in enumerate(map(search_batch, batches)):
+            collect(i, batch)
+        return results
+
+    gc.freeze()
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        for i, batch in pool.imap_unordered(numbered_search, enumerate(batches)):
+            collect(i, batch)
+    return results
+
+
+def numbered_search(numbered):
+    """Runs search_batch on an (i, sources) pair, returning (i, result)."""
+    i, sources = numbered
+    return i, search_batch(sources)
+
+
+def search_batch(sources):
+    """
+    Runs up to WORD breadth-first searches at once.
+
+    Every person holds a word whose bit k is set once source k has reached
+    them. A level moves the frontier words through the movies with one
+    gather and one OR-reduction per side of the star relation.
+    """
+    people = arrays["people"]
+    bits = np.left_shift(np.uint64(1), np.arange(len(sources), dtype=np.uint64))
+    frontier = np.zeros(people, dtype=np.uint64)
+    frontier[sources] = bits
+    visited = frontier.copy()
+    movie_words = np.zeros(arrays["movies"], dtype=np.uint64)
+    reached = np.zeros(people, dtype=np.uint64)
+
+    levels = []
+    while True:
+        movie_words[arrays["linked_movies"]] = np.bitwise_or.reduceat(
+            frontier[arrays["movie_stars"]], arrays["movie_starts"])
+        reached[arrays["linked_people"]] = np.bitwise_or.reduceat(
+            movie_words[arrays["person_movies"]], arrays["person_starts"])
+        frontier = reached & ~visited
+        found = frontier[frontier != 0]
+        if not len(found):
+            break
+        visited |= frontier
+
+        # count, for every source, how many people it reached at this level
+        counts = np.unpackbits(
+            found.astype("<u8", copy=False).view(np.uint8), bitorder="little"
+        ).reshape(-1, WORD).sum(axis=0)
+        levels.append(counts[:len(sources)])
+
+    if not levels:
+        empty = np.zeros(len(sources), dtype=np.int64)
+        return {"reachable": empty, "distance": empty, "eccentricity": empty,
+                "histogram": np.zeros(1, dtype=np.int64)}
+
+    levels = np.array(levels, dtype=np.int64)
+    depths = np.arange(1, len(levels) + 1)
+    return {
+        "reachable": levels.sum(axis=0),
+        "distance": (levels * depths[:, None]).sum(axis=0),
+        "eccentricity": np.where(
+            levels > 0, depths[:, None], 0).max(axis=0),
+        "histogram": np.concatenate([[0], levels.sum(axis=1)])
+    }
+
+
+def write_people(filename, sources, results):
+    """
+    Writes the reachable count, average degree of separation
+    and eccentricity of every source person to a CSV file.
+    """
+    graph = degrees.graph
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "name", "reachable", "average", "eccentricity"])
+        for i, person in enumerate(sources):
+            person_id = graph.person_ids[person]
+            reachable = results["reachable"][i]
+            average = results["distance"][i] / reachable if reachable else ""
+            writer.writerow([
+                person_id, degrees.people[person_id]["name"], reachable,
+                f"{average:.4f}" if reachable else average,
+                results["eccentricity"][i]
+            ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+
+
+class StringTable(Sequence):
+    """
+    Strings stored back to back as UTF-8 in a buffer, such as a section
+    of a memory-mapped snapshot: string i is data[offsets[i]:offsets[i + 1]],
+    decoded when accessed. Strings appended later are kept in a list.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+        self.base = len(offsets) - 1
+        self.added = []
+
+    @staticmethod
+    def pack(strings):
+        """Returns the (offsets, data) of a table of the given strings."""
+        offsets = array("q", [0])
+        data = bytearray()
+        for string in strings:
+            data += string.encode("utf-8")
+            offsets.append(len(data))
+        return offsets, data
+
+    def __len__(self):
+        return self.base + len(self.added)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+            if i < 0:
+                raise IndexError("string table index out of range")
+        if i >= self.base:
+            return self.added[i - self.base]
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def append(self, string):
+        self.added.append(string)
+
+
+class TableIndex(Mapping):
+    """
+    Maps the strings of a StringTable to their positions, by bisection
+    over order, the positions of the table sorted by their string.
+    Strings added later are kept in a dictionary.
+    """
+
+    def __init__(self, table, order):
+        self.table = table
+        self.order = order
+        self.added = {}
+
+    @staticmethod
+    def pack(strings):
+        """Returns the order of a list of strings."""
+        return array("i", sorted(range(len(strings)), key=strings.__getitem__))
+
+    def __getitem__(self, string):
+        position = self.added.get(string)
+        if position is not None:
+            return position
+        order, table = self.order, self.table
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if table[order[middle]] < string:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(order) and table[order[low]] == string:
+            return order[low]
+        raise KeyError(string)
+
+    def __setitem__(self, string, position):
+        self.added[string] = position
+
+    def __iter__(self):
+        for position in self.order:
+            yield self.table[position]
+        yield from self.added
+
+    def __len__(self):
+        return len(self.order) + len(self.added)
+
+
+class Rows(Mapping):
+    """
+    Maps the ids of a table, looked up through a TableIndex, to
+    dictionaries of its columns, StringTables in the same order as the
+    ids. A row is built on first access and kept, rows added later are
+    only kept.
+    """
+
+    def __init__(self, index, columns):
+        self.index = index
+        self.columns = columns
+        self.base = len(index.order)
+        self.rows = {}
+        self.added = []
+
+    def __getitem__(self, key):
+        row = self.rows.get(key)
+        if row is None:
+            position = self.index[key]
+            if position >= self.base:
+                raise KeyError(key)
+            row = self.rows[key] = {
+                name: column[position] for name, column in self.columns.items()
+            }
+        return row
+
+    def __setitem__(self, key, row):
+        if key not in self:
+            self.added.append(key)
+        self.rows[key] = row
+
+    def __iter__(self):
+        for position in range(self.base):
+            yield self.index.table[position]
+        yield from self.added
+
+    def __len__(self):
+        return self.base + len(self.added)
+
+
+class NameTable(Mapping):
+    """
+    Maps lowercase names to sets of person ids. The names are a sorted
+    StringTable, and the people of name k are person_ids at the positions
+    people[offsets[k]:offsets[k + 1]]. A set is built on first access and
+    kept, as are names added later.
+    """
+
+    def __init__(self, table, offsets, people, person_ids):
+        self.table = table
+        self.offsets = offsets
+        self.people = people
+        self.person_ids = person_ids
+        self.sets = {}
+        self.added = []
+
+    @staticmethod
+    def pack(names, person_index):
+        """
+        Returns the (table, offsets, people) of a dictionary of names,
+        the people given by their position in person_index.
+        """
+        table = sorted(names)
+        offsets = array("i", [0])
+        people = array("i")
+        for name in table:
+            people.extend(sorted(person_index[person_id] for person_id in names[name]))
+            offsets.append(len(people))
+        return table, offsets, people
+
+    def __getitem__(self, name):
+        person_ids = self.sets.get(name)
+        if person_ids is None:
+            k = bisect_left(self.table, name)
+            if k == len(self.table) or self.table[k] != name:
+                raise KeyError(name)
+            person_ids = self.sets[name] = {
+                self.person_ids[person]
+                for person in self.people[self.offsets[k]:self.offsets[k + 1]]
+            }
+        return person_ids
+
+    def __setitem__(self, name, person_ids):
+        if name not in self:
+            self.added.append(name)
+        self.sets[name] = person_ids
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def __iter__(self):
+        yield from self.table
+        yield from self.added
+
+    def __len__(self):
+        return len(self.table) + len(self.added)
@@ -0,0 +1,73 @@
+import csv
+import os
+
+
+def read_delta(directory):
+    """
+    Reads a delta from a directory laid out like a dataset: any of
+    people.csv, movies.csv and stars.csv, holding only the new rows.
+
+    Returns a dictionary of people rows, movie rows
+    and (person_id, movie_id) star links.
+    """
+    delta = {"people": [], "movies": [], "stars": []}
+    for name in ["people", "movies", "stars"]:
+        path = os.path.join(directory, f"{name}.csv")
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if name == "people":
+                    delta[name].append((row["id"], row["name"], row["birth"]))
+                elif name == "movies":
+                    delta[name].append((row["id"], row["title"], row["year"]))
+                else:
+                    delta[name].append((row["person_id"], row["movie_id"]))
+    return delta
+
+
+def merge_delta(people, movies, names, graph, delta):
+    """
+    Merges a delta into loaded data: the people, movies and names
+    dictionaries, and the graph if the data was loaded compact (otherwise
+    the star sets of people and movies are updated).
+
+    People and movies that already exist are left as they are, as are
+    links to unknown people or movies. Returns the set of person ids that
+    gained a co-star, empty if the delta added no links.
+    """
+    for person_id, name, birth in delta["people"]:
+        if person_id in people:
+            continue
+        people[person_id] = {"name": name, "birth": birth}
+        if graph is None:
+            people[person_id]["movies"] = set()
+        else:
+            graph.add_person(person_id)
+        names.setdefault(name.lower(), set()).add(person_id)
+
+    for movie_id, title, year in delta["movies"]:
+        if movie_id in movies:
+            continue
+        movies[movie_id] = {"title": title, "year": year}
+        if graph is None:
+            movies[movie_id]["stars"] = set()
+        else:
+            graph.add_movie(movie_id)
+
+    # Every new link joins the person to all stars of the movie
+    touched = set()
+    for person_id, movie_id in delta["stars"]:
+        if person_id not in people or movie_id not in movies:
+            continue
+        if graph is None:
+            stars = movies[movie_id]["stars"]
+            if person_id in stars:
+                continue
+            stars.add(person_id)
+            people[person_id]["movies"].add(movie_id)
+            touched.update(stars)
+        elif graph.add_star(person_id, movie_id):
+            movie = graph.movie_index[movie_id]
+            touched.update(graph.person_ids[star] for star in graph.stars_of(movie))
+    return touched
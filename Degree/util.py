@@ -1,3 +1,8 @@
+import heapq
+import itertools
+from collections import deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -36,3 +41,69 @@ class QueueFrontier(StackFrontier):
             node = self.frontier[0]
             self.frontier = self.frontier[1:]
             return node
+
+
+class FastStackFrontier():
+    """
+    Stack frontier backed by a deque, with a count of the states it holds
+    so that add, remove and contains_state all take constant time.
+    """
+
+    def __init__(self):
+        self.frontier = deque()
+        self.states = {}
+
+    def add(self, node):
+        self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def contains_state(self, state):
+        return state in self.states
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.pop()
+            self.forget(node.state)
+            return node
+
+    def pop(self):
+        return self.frontier.pop()
+
+    def forget(self, state):
+        if self.states[state] == 1:
+            del self.states[state]
+        else:
+            self.states[state] -= 1
+
+
+class FastQueueFrontier(FastStackFrontier):
+
+    def pop(self):
+        return self.frontier.popleft()
+
+
+class PriorityFrontier(FastStackFrontier):
+    """
+    Frontier that always removes the node with the lowest priority,
+    as computed by the given function of a node (for example its path
+    cost plus a heuristic), breaking ties in insertion order.
+    """
+
+    def __init__(self, priority):
+        super().__init__()
+        self.frontier = []
+        self.priority = priority
+        self.counter = itertools.count()
+
+    def add(self, node):
+        heapq.heappush(
+            self.frontier, (self.priority(node), next(self.counter), node))
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def pop(self):
+        return heapq.heappop(self.frontier)[2]
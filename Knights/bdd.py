@@ -0,0 +1,357 @@
+import sys
+import time
+
+from logic import Symbol, Not, And, Or, Implication, Biconditional
+
+# Terminal nodes
+FALSE = 0
+TRUE = 1
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python bdd.py puzzle")
+    import puzzle
+    knowledge = getattr(puzzle, f"knowledge{sys.argv[1]}")
+
+    diagram = KnowledgeDiagram(knowledge)
+    for name in diagram.bdd.order:
+        if diagram.entails(Symbol(name)):
+            print(f"    {name}")
+    stats = diagram.stats()
+    print(f"{diagram.model_count()} models, {stats['nodes']} nodes "
+          f"({stats['table']} in table) over {stats['symbols']} symbols, "
+          f"built in {stats['build_seconds'] * 1000:.2f}ms")
+
+
+class BDD():
+    """
+    Reduced ordered binary decision diagrams over an order of symbol
+    names, all sharing their nodes.
+
+    A node is an integer: FALSE, TRUE, or an index into level, low and
+    high, testing the symbol at its level and leading to low if it is
+    false and to high if it is true. The unique table keeps a single node
+    for every (level, low, high), so equal functions are the same node,
+    and the operation cache remembers every operation already applied.
+    """
+
+    def __init__(self, order=()):
+        self.order = []
+        self.levels = {}
+        self.level = [None, None]
+        self.low = [None, None]
+        self.high = [None, None]
+        self.unique = {}
+        self.cache = {}
+        for name in order:
+            self.add_symbol(name)
+
+    def __len__(self):
+        return len(self.level)
+
+    def add_symbol(self, name):
+        """Adds a symbol name after every symbol in the order."""
+        if name not in self.levels:
+            self.levels[name] = len(self.order)
+            self.order.append(name)
+
+    def level_of(self, node):
+        """Returns the level of a node, terminals being below every level."""
+        return len(self.order) if node <= TRUE else self.level[node]
+
+    def node(self, level, low, high):
+        """Returns the node testing a level, creating it if needed."""
+        if low == high:
+            return low
+        key = (level, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            node = len(self.level)
+            self.level.append(level)
+            self.low.append(low)
+            self.high.append(high)
+            self.unique[key] = node
+        return node
+
+    def variable(self, name):
+        """Returns the node of a symbol."""
+        self.add_symbol(name)
+        return self.node(self.levels[name], FALSE, TRUE)
+
+    def negate(self, u):
+        """Returns the node of the negation of u."""
+        # post-order walk with an explicit stack, so that deep diagrams do
+        # not hit the recursion limit: a node is negated once both of its
+        # children are
+        stack = [u]
+        while stack:
+            node = stack[-1]
+            if self.negation(node) is not None:
+                stack.pop()
+                continue
+            low, high = self.negation(self.low[node]), self.negation(self.high[node])
+            if low is None or high is None:
+                if low is None:
+                    stack.append(self.low[node])
+                if high is None:
+                    stack.append(self.high[node])
+                continue
+            stack.pop()
+            self.cache[("not", node)] = self.node(self.level[node], low, high)
+        return self.negation(u)
+
+    def negation(self, u):
+        """Returns the node of the negation of u if known, None otherwise."""
+        if u <= TRUE:
+            return TRUE - u
+        return self.cache.get(("not", u))
+
+    def apply(self, operation, u, v):
+        """
+        Returns the node of u and v combined by an operation:
+        "and", "or" or "xor".
+        """
+        # post-order walk with an explicit stack, as in negate: a pair is
+        # combined once the pairs of their low and high children are
+        stack = [(u, v)]
+        while stack:
+            u, v = stack[-1]
+            if self.applied(operation, u, v) is not None:
+                stack.pop()
+                continue
+            level = min(self.level[u], self.level[v])
+            u_low, u_high = (self.low[u], self.high[u]) if self.level[u] == level else (u, u)
+            v_low, v_high = (self.low[v], self.high[v]) if self.level[v] == level else (v, v)
+            low = self.applied(operation, u_low, v_low)
+            high = self.applied(operation, u_high, v_high)
+            if low is None or high is None:
+                if low is None:
+                    stack.append((u_low, v_low))
+                if high is None:
+                    stack.append((u_high, v_high))
+                continue
+            stack.pop()
+            # every operation is commutative, so (u, v) and (v, u) share a result
+            self.cache[(operation, min(u, v), max(u, v))] = self.node(level, low, high)
+        return self.applied(operation, u, v)
+
+    def applied(self, operation, u, v):
+        """
+        Returns the node of u and v combined by an operation if it is
+        trivial or already cached, None otherwise.
+        """
+        if operation == "and":
+            if u == FALSE or v == FALSE:
+                return FALSE
+            if u == TRUE or u == v:
+                return v
+            if v == TRUE:
+                return u
+        elif operation == "or":
+            if u == TRUE or v == TRUE:
+                return TRUE
+            if u == FALSE or u == v:
+                return v
+            if v == FALSE:
+                return u
+        else:
+            if u == v:
+                return FALSE
+            if u == FALSE:
+                return v
+            if v == FALSE:
+                return u
+            if u == TRUE:
+                return self.negate(v)
+            if v == TRUE:
+                return self.negate(u)
+        return self.cache.get((operation, min(u, v), max(u, v)))
+
+    def build(self, sentence):
+        """Returns the node of a logical sentence."""
+        # post-order walk with an explicit stack, building every distinct
+        # subformula once; each entry is a sentence and whether its
+        # operands have been built already
+        built = {}
+        stack = [(sentence, False)]
+        while stack:
+            node, ready = stack.pop()
+            if id(node) in built:
+                continue
+            if isinstance(node, Symbol):
+                built[id(node)] = self.variable(node.name)
+                continue
+            operands = node.operands()
+            if not ready:
+                stack.append((node, True))
+                stack.extend((operand, False) for operand in reversed(operands)
+                             if id(operand) not in built)
+                continue
+
+            values = [built[id(operand)] for operand in operands]
+            if isinstance(node, Not):
+                result = self.negate(values[0])
+            elif isinstance(node, And):
+                result = TRUE
+                for value in values:
+                    result = self.apply("and", result, value)
+            elif isinstance(node, Or):
+                result = FALSE
+                for value in values:
+                    result = self.apply("or", result, value)
+            elif isinstance(node, Implication):
+                result = self.apply("or", self.negate(values[0]), values[1])
+            elif isinstance(node, Biconditional):
+                result = self.negate(self.apply("xor", values[0], values[1]))
+            else:
+                raise TypeError("must be a logical sentence")
+            built[id(node)] = result
+        return built[id(sentence)]
+
+    def restrict(self, u, values):
+        """
+        Returns the node of u with symbols fixed to the given values
+        (a dictionary of symbol name to truth value).
+        """
+        fixed = {self.levels[name]: value
+                 for name, value in values.items() if name in self.levels}
+        restricted = {FALSE: FALSE, TRUE: TRUE}
+
+        # post-order walk with an explicit stack, as in negate
+        stack = [u]
+        while stack:
+            node = stack[-1]
+            if node in restricted:
+                stack.pop()
+                continue
+            level = self.level[node]
+            if level in fixed:
+                children = [self.high[node] if fixed[level] else self.low[node]]
+            else:
+                children = [self.low[node], self.high[node]]
+            pending = [child for child in children if child not in restricted]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            if level in fixed:
+                restricted[node] = restricted[children[0]]
+            else:
+                restricted[node] = self.node(level, restricted[children[0]],
+                                             restricted[children[1]])
+        return restricted[u]
+
+    def count(self, u, levels):
+        """
+        Returns the number of assignments to the first levels symbols
+        that make u true (u may only test those symbols).
+        """
+        counts = {FALSE: 0, TRUE: 1}
+
+        # post-order walk with an explicit stack, as in negate
+        stack = [u]
+        while stack:
+            node = stack[-1]
+            if node in counts:
+                stack.pop()
+                continue
+            low, high = self.low[node], self.high[node]
+            pending = [child for child in [low, high] if child not in counts]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            counts[node] = (
+                counts[low] * 2 ** (min(self.level_of(low), levels) - self.level[node] - 1)
+                + counts[high] * 2 ** (min(self.level_of(high), levels) - self.level[node] - 1))
+        return counts[u] * 2 ** (min(self.level_of(u), levels))
+
+    def reachable(self, u):
+        """Returns the set of nodes reachable from u, terminals included."""
+        seen = {u}
+        stack = [u]
+        while stack:
+            node = stack.pop()
+            if node > TRUE:
+                for child in [self.low[node], self.high[node]]:
+                    if child not in seen:
+                        seen.add(child)
+                        stack.append(child)
+        return seen
+
+
+class KnowledgeDiagram():
+    """
+    Knowledge base compiled into a BDD, for answering many queries:
+    entailment of a literal, model counting and conditioning take time
+    linear in the size of the diagram, and entailment of other sentences
+    is one operation on the two diagrams.
+    """
+
+    def __init__(self, knowledge, order=None):
+        start = time.perf_counter()
+        self.bdd = BDD(order if order is not None else first_occurrences(knowledge))
+        self.symbols = len(self.bdd.order)
+        self.root = self.bdd.build(knowledge)
+        self.build_seconds = time.perf_counter() - start
+
+    def entails(self, query):
+        """Checks if knowledge base entails query."""
+        if isinstance(query, Symbol):
+            return self.bdd.restrict(self.root, {query.name: False}) == FALSE
+        if isinstance(query, Not) and isinstance(query.operand, Symbol):
+            return self.bdd.restrict(self.root, {query.operand.name: True}) == FALSE
+        counter = self.bdd.apply("and", self.root, self.bdd.negate(self.bdd.build(query)))
+        return counter == FALSE
+
+    def model_count(self):
+        """Returns the number of models of knowledge base over its symbols."""
+        return self.bdd.count(self.root, self.symbols)
+
+    def condition(self, values):
+        """
+        Returns the knowledge base with symbols fixed to the given values
+        (a dictionary of symbol name to truth value), sharing this BDD.
+        Its models still range over every symbol of the knowledge base.
+        """
+        conditioned = object.__new__(KnowledgeDiagram)
+        conditioned.bdd = self.bdd
+        conditioned.symbols = self.symbols
+        conditioned.root = self.bdd.restrict(self.root, values)
+        conditioned.build_seconds = 0.0
+        return conditioned
+
+    def size(self):
+        """Returns the number of nodes in the diagram, terminals included."""
+        return len(self.bdd.reachable(self.root))
+
+    def stats(self):
+        return {
+            "symbols": self.symbols,
+            "nodes": self.size(),
+            "table": len(self.bdd),
+            "build_seconds": self.build_seconds
+        }
+
+
+def first_occurrences(sentence):
+    """
+    Returns the symbol names of a sentence in the order a depth-first walk
+    first meets them, which keeps symbols used together close in a BDD.
+    """
+    order = {}
+    seen = set()
+    stack = [sentence]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Symbol):
+            order.setdefault(node.name)
+        elif id(node) not in seen:
+            seen.add(id(node))
+            stack.extend(reversed(node.operands()))
+    return list(order)
+
+
+if __name__ == "__main__":
+    main()
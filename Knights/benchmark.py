@@ -0,0 +1,179 @@
+import itertools
+import os
+import sys
+import time
+
+import puzzle
+from logic import Symbol, Not, Or, Implication, And, model_check
+from parallel import parallel_model_check
+from bdd import KnowledgeDiagram
+from sat import KnowledgeBase
+
+PUZZLES = [
+    ("Puzzle 0", puzzle.knowledge0),
+    ("Puzzle 1", puzzle.knowledge1),
+    ("Puzzle 2", puzzle.knowledge2),
+    ("Puzzle 3", puzzle.knowledge3)
+]
+SYMBOLS = [puzzle.AKnight, puzzle.AKnave, puzzle.BKnight, puzzle.BKnave,
+           puzzle.CKnight, puzzle.CKnave]
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        sys.exit(f"Usage: python benchmark.py {'|'.join(BENCHMARKS)} [args...]")
+    BENCHMARKS[sys.argv[1]](*sys.argv[2:])
+
+
+def best_of(repeat, function, *args):
+    """Returns the shortest time of repeat calls of a function."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def tree_check(knowledge, query):
+    """Checks entailment like model_check, walking the sentence trees."""
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    for values in itertools.product([True, False], repeat=len(symbols)):
+        model = dict(zip(symbols, values))
+        if knowledge.evaluate(model) and not query.evaluate(model):
+            return False
+    return True
+
+
+def compiled(repeat="20"):
+    """
+    Times answering every puzzle (each symbol queried) by walking the
+    sentence trees and by model_check on compiled sentences, then times
+    a single evaluation of each knowledge base both ways.
+    """
+    repeat = int(repeat)
+    print(f"{'puzzle':<10}{'tree':>12}{'compiled':>12}{'speedup':>10}")
+    for name, knowledge in PUZZLES:
+        def answer(check):
+            return [check(knowledge, symbol) for symbol in SYMBOLS]
+        assert answer(tree_check) == answer(model_check)
+        tree = best_of(repeat, answer, tree_check)
+        fast = best_of(repeat, answer, model_check)
+        print(f"{name:<10}{tree * 1000:>10.2f}ms{fast * 1000:>10.2f}ms{tree / fast:>9.1f}x")
+
+    print(f"{'evaluate':<10}{'tree':>12}{'compiled':>12}{'speedup':>10}")
+    symbols = sorted(symbol.name for symbol in SYMBOLS)
+    models = list(itertools.product([True, False], repeat=len(symbols)))
+    dicts = [dict(zip(symbols, model)) for model in models]
+    for name, knowledge in PUZZLES:
+        function = knowledge.compile(symbols)
+        tree = best_of(repeat, lambda: [knowledge.evaluate(model) for model in dicts])
+        fast = best_of(repeat, lambda: [function(model) for model in models])
+        print(f"{name:<10}{tree / len(models) * 1e6:>10.2f}us"
+              f"{fast / len(models) * 1e6:>10.2f}us{tree / fast:>9.1f}x")
+
+
+def scaling(symbols="20", *workers):
+    """
+    Times parallel_model_check on a chain of implications over n symbols,
+    which entails that the first implies the last (so every model is
+    checked) and does not entail the converse (so workers stop early),
+    with 1 to N workers.
+    """
+    chain = [Symbol(f"x{i}") for i in range(int(symbols))]
+    knowledge = And(*[Implication(chain[i], chain[i + 1])
+                      for i in range(len(chain) - 1)])
+    entailed = Or(Not(chain[0]), chain[-1])
+    refuted = Or(Not(chain[-1]), chain[0])
+    counts = [int(count) for count in workers] or list(range(1, os.cpu_count() + 1))
+
+    start = time.perf_counter()
+    assert model_check(knowledge, entailed)
+    serial = time.perf_counter() - start
+    print(f"{len(chain)} symbols, model_check {serial:.3f}s")
+    print(f"{'workers':<10}{'entailed':>12}{'speedup':>10}{'refuted':>12}")
+    for count in counts:
+        start = time.perf_counter()
+        assert parallel_model_check(knowledge, entailed, count)
+        full = time.perf_counter() - start
+        start = time.perf_counter()
+        assert not parallel_model_check(knowledge, refuted, count)
+        early = time.perf_counter() - start
+        print(f"{count:<10}{full:>11.3f}s{serial / full:>9.2f}x{early:>11.3f}s")
+
+
+def incremental(symbols="16", steps="50"):
+    """
+    Times a sequence of small changes to a knowledge base over a chain of
+    implications, each step telling a fact, asking about the last symbol
+    with and without an assumption, then retracting the fact: once with a
+    KnowledgeBase, once rebuilding the And and running model_check.
+    """
+    chain = [Symbol(f"x{i}") for i in range(int(symbols))]
+    rules = [Implication(chain[i], chain[i + 1]) for i in range(len(chain) - 1)]
+    steps = [(chain[i % len(chain)], chain[(i * 7 + 3) % len(chain)])
+             for i in range(int(steps))]
+
+    def ask_knowledge_base():
+        knowledge = KnowledgeBase(*rules)
+        answers = []
+        for fact, assumption in steps:
+            knowledge.tell(fact)
+            answers.append(knowledge.ask(chain[-1]))
+            answers.append(knowledge.ask(chain[-1], [Not(assumption)]))
+            knowledge.retract(fact)
+        return answers
+
+    def rebuild():
+        answers = []
+        for fact, assumption in steps:
+            answers.append(model_check(And(*rules, fact), chain[-1]))
+            answers.append(model_check(And(*rules, fact, Not(assumption)), chain[-1]))
+        return answers
+
+    assert ask_knowledge_base() == rebuild()
+    warm = best_of(3, ask_knowledge_base)
+    cold = best_of(1, rebuild)
+    print(f"{len(chain)} symbols, {len(steps)} steps of 2 queries")
+    print(f"KnowledgeBase {warm * 1000:>10.1f}ms")
+    print(f"model_check   {cold * 1000:>10.1f}ms ({cold / warm:.0f}x)")
+
+
+def diagrams(symbols="16", repeat="20"):
+    """
+    Times compiling each puzzle and a chain of implications over n symbols
+    into a KnowledgeDiagram, then a query (every symbol, and its negation)
+    against the diagram and with model_check, and prints after how many
+    queries compiling pays off.
+    """
+    chain = [Symbol(f"x{i}") for i in range(int(symbols))]
+    cases = PUZZLES + [
+        (f"Chain {len(chain)}", And(*[Implication(chain[i], chain[i + 1])
+                                      for i in range(len(chain) - 1)]))]
+    print(f"{'knowledge':<10}{'nodes':>8}{'build':>12}"
+          f"{'query':>12}{'model_check':>13}{'pays off':>10}")
+    for name, knowledge in cases:
+        queries = [sentence for symbol in sorted(knowledge.symbols())
+                   for sentence in [Symbol(symbol), Not(Symbol(symbol))]]
+        build = best_of(int(repeat), KnowledgeDiagram, knowledge)
+        diagram = KnowledgeDiagram(knowledge)
+        assert ([diagram.entails(query) for query in queries]
+                == [model_check(knowledge, query) for query in queries])
+        query = best_of(int(repeat), lambda: [diagram.entails(query) for query in queries])
+        checked = best_of(1, lambda: [model_check(knowledge, query) for query in queries])
+        query, checked = query / len(queries), checked / len(queries)
+        pays_off = int(build / (checked - query)) + 1 if checked > query else None
+        print(f"{name:<10}{diagram.size():>8}{build * 1000:>10.2f}ms"
+              f"{query * 1e6:>10.1f}us{checked * 1e6:>11.1f}us{pays_off!s:>10}")
+
+
+BENCHMARKS = {
+    "compile": compiled,
+    "scaling": scaling,
+    "incremental": incremental,
+    "bdd": diagrams
+}
+
+
+if __name__ == "__main__":
+    main()
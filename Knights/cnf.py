@@ -0,0 +1,187 @@
+import sys
+from array import array
+
+from logic import Symbol, Not, And, Or, Implication, Biconditional
+
+
+def main():
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python cnf.py puzzle [output]")
+    import puzzle
+    knowledge = getattr(puzzle, f"knowledge{sys.argv[1]}")
+
+    cnf = CNF()
+    cnf.add(knowledge)
+    if len(sys.argv) == 3:
+        with open(sys.argv[2], "w") as f:
+            cnf.write_dimacs(f)
+    else:
+        cnf.write_dimacs(sys.stdout)
+
+
+class CNF():
+    """
+    Conjunctive normal form of logical sentences, by Tseitin encoding.
+
+    Every symbol name is mapped to a variable (a positive integer), and
+    every compound subformula to a variable made equivalent to it by a few
+    clauses, so the clauses grow linearly with the sentences instead of
+    blowing up as distributing Or over And would. Negations are negated
+    literals, Or and Implication are rewritten as negated Ands, and
+    structurally equal subformulas share one variable.
+
+    Clauses are stored flat: clause i is literals[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self):
+        self.variables = 0
+        self.symbols = {}
+        self.definitions = {}
+        self.literals = array("i")
+        self.offsets = array("i", [0])
+        self.true = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def new_variable(self):
+        """Adds a variable that is not a symbol, returning it."""
+        self.variables += 1
+        return self.variables
+
+    def variable(self, name):
+        """Returns the variable of a symbol name, adding it if needed."""
+        if name not in self.symbols:
+            self.symbols[name] = self.new_variable()
+        return self.symbols[name]
+
+    def names(self):
+        """Returns a dictionary of variable to symbol name."""
+        return {variable: name for name, variable in self.symbols.items()}
+
+    def add_clause(self, clause):
+        self.literals.extend(clause)
+        self.offsets.append(len(self.literals))
+
+    def clauses(self, start=0):
+        """Yields every clause from the start-th, as lists of literals."""
+        literals, offsets = self.literals, self.offsets
+        for i in range(start, len(offsets) - 1):
+            yield literals[offsets[i]:offsets[i + 1]].tolist()
+
+    def add(self, sentence):
+        """Asserts a sentence, adding the clauses that encode it."""
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        else:
+            self.add_clause([self.encode(sentence)])
+
+    def encode(self, sentence):
+        """
+        Returns a literal equivalent to the sentence,
+        adding the clauses that define it.
+        """
+        # post-order walk with an explicit stack, so that deep sentences
+        # do not hit the recursion limit, encoding every distinct
+        # subformula once; each entry is a sentence and whether its
+        # operands have been encoded already
+        encoded = {}
+        stack = [(sentence, False)]
+        while stack:
+            node, ready = stack.pop()
+            if id(node) in encoded:
+                continue
+            if isinstance(node, Symbol):
+                encoded[id(node)] = self.variable(node.name)
+                continue
+            operands = node.operands()
+            if not ready:
+                stack.append((node, True))
+                stack.extend((operand, False) for operand in reversed(operands)
+                             if id(operand) not in encoded)
+                continue
+
+            literals = [encoded[id(operand)] for operand in operands]
+            if isinstance(node, Not):
+                literal = -literals[0]
+            elif isinstance(node, And):
+                literal = self.conjunction(literals)
+            elif isinstance(node, Or):
+                literal = -self.conjunction([-literal for literal in literals])
+            elif isinstance(node, Implication):
+                literal = -self.conjunction([literals[0], -literals[1]])
+            elif isinstance(node, Biconditional):
+                literal = self.equivalence(*literals)
+            else:
+                raise TypeError("must be a logical sentence")
+            encoded[id(node)] = literal
+        return encoded[id(sentence)]
+
+    def constant(self):
+        """Returns a variable that is always true."""
+        if self.true is None:
+            self.true = self.new_variable()
+            self.add_clause([self.true])
+        return self.true
+
+    def conjunction(self, literals):
+        """Returns a literal equivalent to the conjunction of literals."""
+        unique = set(literals)
+        if any(-literal in unique for literal in unique):
+            return -self.constant()
+        literals = sorted(unique, key=abs)
+        if self.true is not None:
+            literals = [literal for literal in literals if literal != self.true]
+            if -self.true in literals:
+                return -self.true
+        if not literals:
+            return self.constant()
+        if len(literals) == 1:
+            return literals[0]
+
+        key = ("and", tuple(literals))
+        if key not in self.definitions:
+            variable = self.new_variable()
+            for literal in literals:
+                self.add_clause([-variable, literal])
+            self.add_clause([variable] + [-literal for literal in literals])
+            self.definitions[key] = variable
+        return self.definitions[key]
+
+    def equivalence(self, left, right):
+        """Returns a literal equivalent to left <=> right."""
+        if left == right:
+            return self.constant()
+        if left == -right:
+            return -self.constant()
+
+        # (¬a <=> b) is ¬(a <=> b), so only positive pairs get a variable
+        sign = 1
+        if left < 0:
+            left, sign = -left, -sign
+        if right < 0:
+            right, sign = -right, -sign
+        left, right = sorted([left, right])
+
+        key = ("iff", left, right)
+        if key not in self.definitions:
+            variable = self.new_variable()
+            self.add_clause([-variable, -left, right])
+            self.add_clause([-variable, left, -right])
+            self.add_clause([variable, left, right])
+            self.add_clause([variable, -left, -right])
+            self.definitions[key] = variable
+        return sign * self.definitions[key]
+
+    def write_dimacs(self, f):
+        """Writes the clauses to a file in DIMACS format."""
+        for name, variable in self.symbols.items():
+            f.write(f"c {variable} {name}\n")
+        f.write(f"p cnf {self.variables} {len(self)}\n")
+        for clause in self.clauses():
+            f.write(" ".join(str(literal) for literal in clause) + " 0\n")
+
+
+if __name__ == "__main__":
+    main()
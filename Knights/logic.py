@@ -1,7 +1,58 @@
+import collections
+import functools
 import itertools
 
 
 class Sentence():
+    """
+    Logical sentence. Nodes use slots, and every node without a mutable
+    And inside keeps its hash, and the frozenset of its symbols once asked
+    for (building it for every node of a deep sentence would be quadratic).
+    Interner shares structurally equal subformulas, on request.
+    """
+
+    __slots__ = ("cached_hash", "cached_symbols")
+
+    def cache(self, *hashes):
+        """
+        Caches the hash of a node, computed from the hashes of its operands,
+        if it can no longer change, that is if they all have one cached.
+        """
+        self.cached_symbols = None
+        if None in hashes:
+            self.cached_hash = None
+        else:
+            self.cached_hash = hash(hashes)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, type(self)):
+            return False
+        if (self.cached_hash is not None and other.cached_hash is not None
+                and self.cached_hash != other.cached_hash):
+            return False
+        operands = self.operands()
+        others = other.operands()
+        if type(operands) is not type(others):
+            # a mutable And keeps a list, a frozen one a tuple
+            return tuple(operands) == tuple(others)
+        return operands == others
+
+    def __hash__(self):
+        if self.cached_hash is not None:
+            return self.cached_hash
+        return self.hashed()
+
+    def hashed(self):
+        """Computes the hash of the logical sentence."""
+        raise Exception("nothing to hash")
+
+    def frozen(self):
+        """Returns an immutable sentence equal to this one."""
+        if self.cached_hash is not None:
+            return self
+        return Interner().intern(self)
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
@@ -11,9 +62,56 @@ class Sentence():
         """Returns string formula representing logical sentence."""
         return ""
 
+    def operands(self):
+        """Returns the sentences the logical sentence is made of."""
+        return ()
+
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        if self.cached_symbols is not None:
+            return set(self.cached_symbols)
+        names = set()
+        stack = [self]
+        seen = {id(self)}
+        while stack:
+            for operand in stack.pop().operands():
+                if isinstance(operand, Symbol):
+                    names.add(operand.name)
+                elif operand.cached_symbols is not None:
+                    names.update(operand.cached_symbols)
+                elif id(operand) not in seen:
+                    seen.add(id(operand))
+                    stack.append(operand)
+        if isinstance(self, Symbol):
+            names.add(self.name)
+
+        # a node with a cached hash cannot change any more
+        if self.cached_hash is not None:
+            self.cached_symbols = frozenset(names)
+        return names
+
+    def expression(self, positions):
+        """
+        Returns a Python expression evaluating the logical sentence over
+        a tuple named model, given each symbol's position in it.
+        """
+        raise Exception("nothing to compile")
+
+    def compile(self, symbols):
+        """
+        Compiles the logical sentence into a function of a tuple of truth
+        values, one for each symbol name in symbols, in that order.
+
+        The function is a single generated expression, so evaluating it
+        does not walk the sentence tree; sentences nested too deeply for
+        the Python compiler fall back to evaluate.
+        """
+        positions = {symbol: i for i, symbol in enumerate(symbols)}
+        try:
+            return compile_expression(self.expression(positions))
+        except (RecursionError, SyntaxError, MemoryError):
+            symbols = list(symbols)
+            return lambda model: self.evaluate(dict(zip(symbols, model)))
 
     @classmethod
     def validate(cls, sentence):
@@ -42,15 +140,65 @@ class Sentence():
             return f"({s})"
 
 
+class Interner():
+    """
+    Table of shared sentences: interning a sentence returns an equal one
+    in which every subformula equal to one interned before is that same
+    object, so repeated subformulas are stored once and compared by
+    identity. Interned sentences are immutable, an And included; they
+    stay alive as long as the table does.
+    """
+
+    def __init__(self):
+        self.sentences = {}
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def intern(self, sentence):
+        """Returns the shared sentence equal to a sentence."""
+        # post-order walk with an explicit stack; each entry is a sentence
+        # and whether its operands have been interned already
+        interned = {}
+        stack = [(sentence, False)]
+        while stack:
+            node, ready = stack.pop()
+            if id(node) in interned:
+                continue
+            operands = node.operands()
+            if not ready and operands:
+                stack.append((node, True))
+                stack.extend((operand, False) for operand in reversed(operands)
+                             if id(operand) not in interned)
+                continue
+
+            shared = [interned[id(operand)] for operand in operands]
+            if all(a is b for a, b in zip(shared, operands)) and node.cached_hash is not None:
+                candidate = node
+            elif isinstance(node, And):
+                candidate = type(node)(*shared).freeze()
+            else:
+                candidate = type(node)(*shared)
+            interned[id(node)] = self.sentences.setdefault(candidate, candidate)
+        return interned[id(sentence)]
+
+
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
     def __init__(self, name):
         self.name = name
+        self.cached_hash = hash(("symbol", name))
+        self.cached_symbols = None
 
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (
+            isinstance(other, Symbol) and self.name == other.name)
 
     def __hash__(self):
+        return self.cached_hash
+
+    def hashed(self):
         return hash(("symbol", self.name))
 
     def __repr__(self):
@@ -65,19 +213,30 @@ class Symbol(Sentence):
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
+    def expression(self, positions):
+        try:
+            return f"model[{positions[self.name]}]"
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
 
 
 class Not(Sentence):
+    __slots__ = ("operand",)
+
     def __init__(self, operand):
         Sentence.validate(operand)
         self.operand = operand
+        self.cached_hash = (None if operand.cached_hash is None
+                            else hash(("not", operand.cached_hash)))
+        self.cached_symbols = None
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (
+            isinstance(other, Not) and self.operand == other.operand)
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def hashed(self):
         return hash(("not", hash(self.operand)))
 
     def __repr__(self):
@@ -89,23 +248,38 @@ class Not(Sentence):
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def operands(self):
+        return (self.operand,)
+
+    def expression(self, positions):
+        return f"(not {self.operand.expression(positions)})"
 
 
 class And(Sentence):
+    """
+    Conjunction. It can be added to, so unlike other sentences it keeps
+    no hash, and neither does a sentence it is part of, until frozen.
+    """
+
+    __slots__ = ("conjuncts", "mutable")
+
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
+        self.mutable = True
+        self.cached_hash = None
+        self.cached_symbols = None
 
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+    def hashed(self):
+        return hash(("and",) + tuple(hash(conjunct) for conjunct in self.conjuncts))
 
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+    def freeze(self):
+        """Makes the conjunction immutable, and returns it."""
+        self.conjuncts = tuple(self.conjuncts)
+        self.mutable = False
+        self.cache("and", *[conjunct.cached_hash for conjunct in self.conjuncts])
+        return self
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -113,8 +287,25 @@ class And(Sentence):
         )
         return f"And({conjunctions})"
 
+    def symbols(self):
+        # every conjunct that can no longer change keeps its own symbols,
+        # so asking again once more conjuncts are added stays cheap
+        if self.cached_symbols is not None:
+            return set(self.cached_symbols)
+        names = set()
+        for conjunct in self.conjuncts:
+            if conjunct.cached_symbols is None:
+                names.update(conjunct.symbols())
+            else:
+                names.update(conjunct.cached_symbols)
+        if self.cached_hash is not None:
+            self.cached_symbols = frozenset(names)
+        return names
+
     def add(self, conjunct):
         Sentence.validate(conjunct)
+        if not self.mutable:
+            raise Exception("cannot add to a frozen conjunction")
         self.conjuncts.append(conjunct)
 
     def evaluate(self, model):
@@ -126,23 +317,34 @@ class And(Sentence):
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def operands(self):
+        return self.conjuncts
+
+    def expression(self, positions):
+        if not self.conjuncts:
+            return "True"
+        return "(" + " and ".join(
+            [conjunct.expression(positions) for conjunct in self.conjuncts]
+        ) + ")"
 
 
 class Or(Sentence):
+    __slots__ = ("disjuncts",)
+
     def __init__(self, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+        self.disjuncts = disjuncts
+        self.cache("or", *[disjunct.cached_hash for disjunct in disjuncts])
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (
+            isinstance(other, Or) and self.disjuncts == other.disjuncts)
 
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+    __hash__ = Sentence.__hash__
+
+    def hashed(self):
+        return hash(("or",) + tuple(hash(disjunct) for disjunct in self.disjuncts))
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -157,23 +359,39 @@ class Or(Sentence):
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def operands(self):
+        return self.disjuncts
+
+    def expression(self, positions):
+        if not self.disjuncts:
+            return "False"
+        return "(" + " or ".join(
+            [disjunct.expression(positions) for disjunct in self.disjuncts]
+        ) + ")"
 
 
 class Implication(Sentence):
+    __slots__ = ("antecedent", "consequent")
+
     def __init__(self, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
         self.antecedent = antecedent
         self.consequent = consequent
+        self.cached_hash = (
+            None if antecedent.cached_hash is None or consequent.cached_hash is None
+            else hash(("implies", antecedent.cached_hash, consequent.cached_hash)))
+        self.cached_symbols = None
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (
+            isinstance(other, Implication)
+            and self.antecedent == other.antecedent
+            and self.consequent == other.consequent)
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def hashed(self):
         return hash(("implies", hash(self.antecedent), hash(self.consequent)))
 
     def __repr__(self):
@@ -188,23 +406,36 @@ class Implication(Sentence):
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def operands(self):
+        return (self.antecedent, self.consequent)
+
+    def expression(self, positions):
+        antecedent = self.antecedent.expression(positions)
+        consequent = self.consequent.expression(positions)
+        return f"(not {antecedent} or {consequent})"
 
 
 class Biconditional(Sentence):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
         self.left = left
         self.right = right
+        self.cached_hash = (
+            None if left.cached_hash is None or right.cached_hash is None
+            else hash(("biconditional", left.cached_hash, right.cached_hash)))
+        self.cached_symbols = None
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (
+            isinstance(other, Biconditional)
+            and self.left == other.left and self.right == other.right)
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def hashed(self):
         return hash(("biconditional", hash(self.left), hash(self.right)))
 
     def __repr__(self):
@@ -221,43 +452,112 @@ class Biconditional(Sentence):
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+    def operands(self):
+        return (self.left, self.right)
+
+    def expression(self, positions):
+        left = self.left.expression(positions)
+        right = self.right.expression(positions)
+        return f"({left} == {right})"
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_expression(expression):
+    """Returns a function of model evaluating a Python expression."""
+    return eval(f"lambda model: {expression}")
 
 
 def model_check(knowledge, query):
     """Checks if knowledge base entails query."""
 
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
-
-        # If model has an assignment for each symbol
-        if not symbols:
+    # Split knowledge base into its conjuncts, and give the symbols in the
+    # fewest conjuncts the lowest positions, which are flipped most often
+    conjuncts = conjuncts_of(knowledge)
+    occurrences = collections.Counter(
+        name for conjunct in conjuncts for name in conjunct.symbols())
+    symbols = sorted(knowledge.symbols() | query.symbols(),
+                     key=lambda name: (occurrences[name], name))
+    positions = {symbol: i for i, symbol in enumerate(symbols)}
+
+    # Compile every conjunct, those over the least often flipped symbols
+    # first, along with the positions of its symbols
+    conjuncts.sort(key=lambda conjunct: -min(
+        [positions[name] for name in conjunct.symbols()], default=len(symbols)))
+    functions = [conjunct.compile(symbols) for conjunct in conjuncts]
+    mentions = [frozenset(positions[name] for name in conjunct.symbols())
+                for conjunct in conjuncts]
+    index = [[] for symbol in symbols]
+    for i, mentioned in enumerate(mentions):
+        for position in mentioned:
+            index[position].append(i)
+    query = query.compile(symbols)
+
+    # Visit every model of a single assignment in Gray code order, where
+    # the symbol flipped at each step is the lowest bit set in the step
+    # number; a conjunct false in the model (the witness) shows knowledge
+    # base is false until one of its symbols is flipped, so only then are
+    # the conjuncts evaluated again, and while knowledge base is true only
+    # the conjuncts over the flipped symbol can become false
+    model = [False] * len(symbols)
+    witness = None
+    flipped = None
+    for step in range(1, 2 ** len(symbols) + 1):
+        if flipped is None:
+            changed = range(len(functions))
+        elif witness is None:
+            changed = index[flipped]
+        elif flipped in mentions[witness] and functions[witness](model):
+            changed = range(len(functions))
+        else:
+            changed = None
+        if changed is not None:
+            witness = next((i for i in changed if not functions[i](model)), None)
 
             # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
+            if witness is None and not query(model):
+                return False
+        flipped = (step & -step).bit_length() - 1
+        if flipped < len(model):
+            model[flipped] = not model[flipped]
+    return True
+
+
+def conjuncts_of(sentence):
+    """Returns the list of conjuncts of a sentence, nested Ands flattened."""
+    conjuncts = []
+    stack = [sentence]
+    while stack:
+        sentence = stack.pop()
+        if isinstance(sentence, And):
+            stack.extend(reversed(sentence.conjuncts))
         else:
-
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
-
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
-
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+            conjuncts.append(sentence)
+    return conjuncts
+
+
+def backbone(knowledge, symbols=()):
+    """
+    Enumerates the models of knowledge base once, over its symbols and any
+    other symbol names given, and returns (fixed, models): a dictionary of
+    every symbol name with the same value in all models (so that the
+    knowledge base entails the symbol, or its negation) to that value,
+    and the number of models.
+
+    With no models, the knowledge base entails everything; fixed is then
+    empty, so callers must check models first.
+    """
+    symbols = sorted(knowledge.symbols().union(symbols))
+    knowledge = knowledge.compile(symbols)
+
+    first = None
+    agreeing = []
+    models = 0
+    for model in itertools.product([True, False], repeat=len(symbols)):
+        if knowledge(model):
+            models += 1
+            if first is None:
+                first = model
+                agreeing = list(range(len(symbols)))
+            elif agreeing:
+                agreeing = [i for i in agreeing if model[i] == first[i]]
+    return {symbols[i]: first[i] for i in agreeing}, models
@@ -0,0 +1,91 @@
+import collections
+import itertools
+import multiprocessing
+import os
+
+from logic import Symbol, model_check
+
+# Compiled knowledge base and query, and how many symbols each worker
+# enumerates, shared with forked workers
+problem = None
+
+# Set by the first worker to find a counter-model, so the others stop
+stop = None
+
+# Models enumerated between checks of stop
+CHECK_EVERY = 4096
+
+
+def parallel_model_check(knowledge, query, workers=None, split=None):
+    """
+    Checks if knowledge base entails query like model_check, splitting
+    the models across a pool of worker processes.
+
+    The split symbols (by default enough for about four subproblems per
+    worker) are fixed to each of their 2 ** split combinations, one
+    subproblem each, and every worker enumerates the rest of the symbols
+    for its subproblems. Symbols are fixed in decreasing order of how
+    often they occur, so that the subproblems are as alike as possible.
+    Once any worker finds a model of knowledge base where query is false,
+    the others stop. The workers are forked to share the compiled
+    sentences, so if forking is not available this is model_check.
+    """
+    global problem, stop
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return model_check(knowledge, query)
+    workers = workers or os.cpu_count()
+    symbols = occurrence_order(knowledge, query)
+    if split is None:
+        split = (workers * 4 - 1).bit_length()
+    split = min(split, len(symbols))
+
+    problem = (knowledge.compile(symbols), query.compile(symbols),
+               len(symbols) - split)
+    context = multiprocessing.get_context("fork")
+    stop = context.Event()
+    prefixes = itertools.product([True, False], repeat=split)
+    with context.Pool(workers) as pool:
+        for entailed in pool.imap_unordered(check_prefix, prefixes):
+            if not entailed:
+                return False
+    return True
+
+
+def check_prefix(prefix):
+    """
+    Checks every model starting with the given values of the split
+    symbols, returning False if one is a counter-model.
+    """
+    knowledge, query, free = problem
+    models = itertools.product(*[[value] for value in prefix],
+                               *[[True, False]] * free)
+    for _ in range(0, 2 ** free, CHECK_EVERY):
+        if stop.is_set():
+            return True
+        for model in itertools.islice(models, CHECK_EVERY):
+            if knowledge(model) and not query(model):
+                stop.set()
+                return False
+    return True
+
+
+def occurrence_order(*sentences):
+    """
+    Returns the names of the symbols of the sentences, from the one that
+    occurs in the most sentence nodes to the one that occurs in the fewest.
+    """
+    counts = collections.Counter()
+    stack = list(sentences)
+    seen = {id(sentence) for sentence in sentences}
+    while stack:
+        sentence = stack.pop()
+        for operand in sentence.operands():
+            if isinstance(operand, Symbol):
+                counts[operand.name] += 1
+            elif id(operand) not in seen:
+                seen.add(id(operand))
+                stack.append(operand)
+    for sentence in sentences:
+        if isinstance(sentence, Symbol):
+            counts[sentence.name] += 1
+    return sorted(counts, key=lambda name: (-counts[name], name))
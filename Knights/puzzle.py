@@ -82,8 +82,10 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
+            # a knowledge base with no models entails every symbol
+            fixed, models = backbone(knowledge, [symbol.name for symbol in symbols])
             for symbol in symbols:
-                if model_check(knowledge, symbol):
+                if models == 0 or fixed.get(symbol.name):
                     print(f"    {symbol}")
 
 
@@ -0,0 +1,380 @@
+import heapq
+
+from cnf import CNF
+
+
+class Solver():
+    """
+    Conflict-driven clause learning SAT solver.
+
+    Variables are positive integers and literals are non-zero integers,
+    -v being the negation of v. Clauses are watched on their first two
+    literals, conflicts are analysed to their first unique implication
+    point, and the learned clause is kept and used to backjump.
+    """
+
+    def __init__(self):
+        self.variables = 0
+        self.clauses = []
+        self.learnts = []
+        self.watches = {}
+        self.unsatisfiable = False
+
+        # Current assignment: value[v] is 1, -1 or 0 (unassigned), with the
+        # decision level and the clause that implied it (None if decided)
+        self.value = [0]
+        self.level = [0]
+        self.reason = [None]
+        self.trail = []
+        self.limits = []
+        self.head = 0
+
+        # Branching: variable activities in a lazily updated max-heap,
+        # bumped on every conflict they take part in, and saved phases
+        self.activity = [0.0]
+        self.increment = 1.0
+        self.heap = []
+        self.phase = [False]
+
+        self.conflicts = 0
+        self.decisions = 0
+        self.propagations = 0
+
+    def new_variable(self):
+        """Adds a variable, returning it."""
+        self.variables += 1
+        for literal in [self.variables, -self.variables]:
+            self.watches[literal] = []
+        self.value.append(0)
+        self.level.append(0)
+        self.reason.append(None)
+        self.activity.append(0.0)
+        self.phase.append(False)
+        heapq.heappush(self.heap, (0.0, self.variables))
+        return self.variables
+
+    def literal_value(self, literal):
+        """Returns 1 if a literal is true, -1 if false, 0 if unassigned."""
+        value = self.value[abs(literal)]
+        return value if literal > 0 else -value
+
+    def add_clause(self, literals):
+        """
+        Adds a clause (a list of literals) to the problem.
+
+        Returns False if the problem became unsatisfiable.
+        """
+        if self.unsatisfiable:
+            return False
+        self.backtrack(0)
+
+        # drop repeated and false literals, skip clauses already satisfied
+        clause = []
+        for literal in literals:
+            while abs(literal) > self.variables:
+                self.new_variable()
+            value = self.literal_value(literal)
+            if value == 1 or -literal in clause:
+                return True
+            if value == 0 and literal not in clause:
+                clause.append(literal)
+
+        if not clause:
+            self.unsatisfiable = True
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            self.unsatisfiable = self.propagate() is not None
+        else:
+            self.clauses.append(clause)
+            self.watch(clause)
+        return not self.unsatisfiable
+
+    def watch(self, clause):
+        self.watches[clause[0]].append(clause)
+        self.watches[clause[1]].append(clause)
+
+    def assign(self, literal, reason):
+        variable = abs(literal)
+        self.value[variable] = 1 if literal > 0 else -1
+        self.level[variable] = len(self.limits)
+        self.reason[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Propagates every assignment on the trail not yet propagated.
+
+        Returns a conflicting clause, or None.
+        """
+        value = self.value
+        watches = self.watches
+        while self.head < len(self.trail):
+            false = -self.trail[self.head]
+            self.head += 1
+            self.propagations += 1
+            watchers = watches[false]
+            kept = []
+            conflict = None
+            for clause in watchers:
+                if conflict is not None:
+                    kept.append(clause)
+                    continue
+
+                # keep the false literal in the second watched position
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], false
+                first = clause[0]
+                if (value[first] if first > 0 else -value[-first]) == 1:
+                    kept.append(clause)
+                    continue
+
+                # look for another literal that is not false to watch
+                for k in range(2, len(clause)):
+                    literal = clause[k]
+                    if (value[literal] if literal > 0 else -value[-literal]) != -1:
+                        clause[1], clause[k] = literal, false
+                        watches[literal].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if (value[first] if first > 0 else -value[-first]) == -1:
+                        conflict = clause
+                    else:
+                        self.assign(first, clause)
+            watches[false] = kept
+            if conflict is not None:
+                return conflict
+        return None
+
+    def analyze(self, conflict):
+        """
+        Derives a clause from a conflict by resolving it with the reasons of
+        current-level literals until only one is left (the first unique
+        implication point).
+
+        Returns the clause, asserting literal first, and the level to
+        backjump to.
+        """
+        current = len(self.limits)
+        seen = set()
+        learnt = [0]
+        pending = 0
+        index = len(self.trail) - 1
+        clause = conflict
+        literal = None
+        while True:
+            for other in clause if literal is None else clause[1:]:
+                variable = abs(other)
+                if variable in seen or self.level[variable] == 0:
+                    continue
+                seen.add(variable)
+                self.bump(variable)
+                if self.level[variable] == current:
+                    pending += 1
+                else:
+                    learnt.append(other)
+
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            clause = self.reason[abs(literal)]
+            pending -= 1
+            if pending == 0:
+                break
+        learnt[0] = -literal
+
+        # watch the literal of the highest level after the asserting one
+        level = 0
+        if len(learnt) > 1:
+            deepest = max(range(1, len(learnt)),
+                          key=lambda i: self.level[abs(learnt[i])])
+            learnt[1], learnt[deepest] = learnt[deepest], learnt[1]
+            level = self.level[abs(learnt[1])]
+        self.increment *= 1.05
+        return learnt, level
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[v], v) for v in range(1, self.variables + 1)]
+            heapq.heapify(self.heap)
+        heapq.heappush(self.heap, (-self.activity[variable], variable))
+
+    def backtrack(self, level):
+        """Undoes every assignment made above the given decision level."""
+        if len(self.limits) <= level:
+            return
+        for literal in self.trail[self.limits[level]:]:
+            variable = abs(literal)
+            self.phase[variable] = literal > 0
+            self.value[variable] = 0
+            self.reason[variable] = None
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+        del self.trail[self.limits[level]:]
+        del self.limits[level:]
+        self.head = len(self.trail)
+
+    def decide(self):
+        """Returns the unassigned variable with the highest activity, or None."""
+        while self.heap:
+            activity, variable = heapq.heappop(self.heap)
+            if self.value[variable] == 0 and -activity == self.activity[variable]:
+                return variable
+        for variable in range(1, self.variables + 1):
+            if self.value[variable] == 0:
+                return variable
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Searches for an assignment satisfying every clause and
+        assumption literal.
+
+        Returns True if there is one (see model), False otherwise.
+        Learned clauses are kept for later calls.
+        """
+        if self.unsatisfiable:
+            return False
+        for literal in assumptions:
+            while abs(literal) > self.variables:
+                self.new_variable()
+        self.backtrack(0)
+        if self.propagate() is not None:
+            self.unsatisfiable = True
+            return False
+
+        restart = 100
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts += 1
+                if not self.limits:
+                    self.unsatisfiable = True
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.learnts.append(learnt)
+                    self.watch(learnt)
+                    self.assign(learnt[0], learnt)
+                continue
+
+            # restart now and then, keeping learned clauses and activities
+            if conflicts >= restart:
+                conflicts = 0
+                restart = int(restart * 1.5)
+                self.backtrack(0)
+                continue
+
+            # assumptions are decided first, each on its own level
+            literal = None
+            while len(self.limits) < len(assumptions):
+                assumption = assumptions[len(self.limits)]
+                value = self.literal_value(assumption)
+                if value == -1:
+                    self.backtrack(0)
+                    return False
+                self.limits.append(len(self.trail))
+                if value == 0:
+                    literal = assumption
+                    break
+            if literal is None:
+                variable = self.decide()
+                if variable is None:
+                    self.model = {
+                        v: self.value[v] == 1 for v in range(1, self.variables + 1)
+                    }
+                    self.backtrack(0)
+                    return True
+                literal = variable if self.phase[variable] else -variable
+                self.limits.append(len(self.trail))
+            self.decisions += 1
+            self.assign(literal, None)
+
+
+def sat_check(knowledge, query):
+    """
+    Checks if knowledge base entails query, by showing that the knowledge
+    base together with the negated query has no model.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    query = cnf.encode(query)
+
+    solver = Solver()
+    for clause in cnf.clauses():
+        solver.add_clause(clause)
+    return not solver.solve([-query])
+
+
+class KnowledgeBase():
+    """
+    Knowledge base that sentences can be told and retracted one at a time,
+    answering queries with a single Solver kept between them, so that the
+    encoding of every sentence seen and every clause learned are reused.
+
+    Each sentence told is guarded by a variable of its own, s => sentence,
+    and asking assumes the guards of the sentences currently told; a
+    retracted sentence has its guard set false for good, which leaves the
+    clauses (and anything learned from them) valid.
+    """
+
+    def __init__(self, *sentences):
+        self.cnf = CNF()
+        self.solver = Solver()
+        self.encoded = 0
+        self.guards = {}
+        for sentence in sentences:
+            self.tell(sentence)
+
+    def __contains__(self, sentence):
+        return sentence.frozen() in self.guards
+
+    def __len__(self):
+        return len(self.guards)
+
+    def sentences(self):
+        """Returns the list of sentences currently told."""
+        return list(self.guards)
+
+    def tell(self, sentence):
+        """Adds a sentence to the knowledge base."""
+        sentence = sentence.frozen()
+        if sentence in self.guards:
+            return
+        guard = self.cnf.new_variable()
+        self.cnf.add_clause([-guard, self.cnf.encode(sentence)])
+        self.guards[sentence] = guard
+
+    def retract(self, sentence):
+        """Removes a sentence told before from the knowledge base."""
+        sentence = sentence.frozen()
+        if sentence not in self.guards:
+            raise Exception(f"{sentence.formula()} not in knowledge base")
+        self.cnf.add_clause([-self.guards.pop(sentence)])
+
+    def ask(self, query, assumptions=()):
+        """
+        Checks if the knowledge base, together with the assumption
+        sentences (for what-if questions), entails query.
+        """
+        query = self.cnf.encode(query)
+        return not self.satisfiable([-query], assumptions)
+
+    def consistent(self, assumptions=()):
+        """Checks if the knowledge base and the assumptions have a model."""
+        return self.satisfiable([], assumptions)
+
+    def satisfiable(self, literals, assumptions):
+        literals = [self.cnf.encode(assumption) for assumption in assumptions] + literals
+        for clause in self.cnf.clauses(self.encoded):
+            self.solver.add_clause(clause)
+        self.encoded = len(self.cnf)
+        return self.solver.solve(list(self.guards.values()) + literals)
@@ -0,0 +1,192 @@
+import functools
+import operator
+import sys
+import time
+
+import numpy as np
+
+from logic import Symbol
+
+# Assignments evaluated together: 2 ** BLOCK_BITS, packed 64 to a word
+BLOCK_BITS = 20
+
+ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+ZEROS = np.uint64(0)
+
+# Truth values of the first six symbols across the 64 assignments of a word
+PATTERNS = [
+    0xAAAAAAAAAAAAAAAA,
+    0xCCCCCCCCCCCCCCCC,
+    0xF0F0F0F0F0F0F0F0,
+    0xFF00FF00FF00FF00,
+    0xFFFF0000FFFF0000,
+    0xFFFFFFFF00000000
+]
+
+# Number of set bits in every byte, if NumPy cannot count them itself
+BYTE_COUNTS = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+def main():
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python truthtable.py puzzle [block_bits]")
+    import puzzle
+    knowledge = getattr(puzzle, f"knowledge{sys.argv[1]}")
+    block_bits = int(sys.argv[2]) if len(sys.argv) == 3 else BLOCK_BITS
+
+    symbols = sorted(knowledge.symbols())
+    start = time.perf_counter()
+    table = TruthTable(symbols, block_bits)
+    for symbol in symbols:
+        entailed, models, _ = table.check(knowledge, Symbol(symbol))
+        if entailed:
+            print(f"    {symbol}")
+    print(f"{models} models of {2 ** len(symbols)} assignments, "
+          f"{time.perf_counter() - start:.3f}s")
+
+
+class TruthTable():
+    """
+    Exhaustive truth table over a list of symbol names, evaluated with
+    bitwise operations on packed columns instead of one model at a time.
+
+    Assignment a gives symbol i the value of bit i of a. The table is
+    streamed in blocks of 2 ** block_bits assignments, each a column of
+    64-bit words per symbol: the first block_bits symbols have the same
+    column in every block, and the others are constant within a block,
+    so memory stays bounded however many symbols there are, and parts of
+    a sentence over the first symbols only are evaluated just once.
+    """
+
+    def __init__(self, symbols, block_bits=BLOCK_BITS):
+        self.symbols = list(symbols)
+        self.positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.bits = max(6, min(len(self.symbols), block_bits))
+        self.blocks = 2 ** max(0, len(self.symbols) - self.bits)
+
+        # with fewer than six symbols, a word has unused assignments
+        if len(self.symbols) < 6:
+            self.mask = np.uint64(2 ** 2 ** len(self.symbols) - 1)
+        else:
+            self.mask = ONES
+
+        words = 2 ** (self.bits - 6)
+        index = np.arange(words, dtype=np.uint64)
+        self.columns = []
+        for i in range(min(len(self.symbols), self.bits)):
+            if i < 6:
+                column = np.full(words, PATTERNS[i], dtype=np.uint64)
+            else:
+                column = np.where((index >> np.uint64(i - 6)) & np.uint64(1), ONES, ZEROS)
+            self.columns.append(column)
+        self.words = words
+
+    def check(self, knowledge, query):
+        """
+        Returns (entailed, models, counterexamples): whether knowledge base
+        entails query, the number of assignments where the knowledge base
+        is true, and the number of those where query is false.
+        """
+        knowledge = self.prepare(knowledge)
+        query = self.prepare(query)
+        models = 0
+        counterexamples = 0
+        for block in range(self.blocks):
+            truth = self.evaluate(knowledge, block) & self.mask
+            models += self.count(truth)
+            counterexamples += self.count(truth & ~self.evaluate(query, block))
+        return counterexamples == 0, models, counterexamples
+
+    def count_models(self, sentence):
+        """Returns the number of assignments where the sentence is true."""
+        sentence = self.prepare(sentence)
+        return sum(self.count(self.evaluate(sentence, block) & self.mask)
+                   for block in range(self.blocks))
+
+    def count(self, words):
+        """Returns the number of set bits in a column (or a constant word)."""
+        words = np.broadcast_to(words, (self.words,))
+        if hasattr(np, "bitwise_count"):
+            return int(np.bitwise_count(words).sum(dtype=np.int64))
+        return int(BYTE_COUNTS[np.ascontiguousarray(words).view(np.uint8)].sum(dtype=np.int64))
+
+    def prepare(self, sentence):
+        """
+        Returns a sentence as nested tuples of operations, with every part
+        that only involves the first block_bits symbols already evaluated
+        to a column.
+        """
+        # post-order walk with an explicit stack, preparing every distinct
+        # subformula once, so shared ones are shared operations too; each
+        # entry is a sentence and whether its operands have been prepared
+        prepared = {}
+        stack = [(sentence, False)]
+        while stack:
+            node, ready = stack.pop()
+            if id(node) in prepared:
+                continue
+            if isinstance(node, Symbol):
+                if node.name not in self.positions:
+                    raise Exception(f"variable {node.name} not in model")
+                position = self.positions[node.name]
+                if position < self.bits:
+                    prepared[id(node)] = ("column", self.columns[position])
+                else:
+                    prepared[id(node)] = ("symbol", position - self.bits)
+                continue
+            operands = node.operands()
+            if not ready:
+                stack.append((node, True))
+                stack.extend((operand, False) for operand in reversed(operands)
+                             if id(operand) not in prepared)
+                continue
+
+            children = [prepared[id(operand)] for operand in operands]
+            operation = (type(node).__name__, children)
+            if all(child[0] == "column" for child in children):
+                operation = ("column", self.evaluate(operation, 0))
+            prepared[id(node)] = operation
+        return prepared[id(sentence)]
+
+    def evaluate(self, operation, block, evaluated=None):
+        """
+        Returns the column of a prepared sentence in a block, evaluating
+        every operation shared by several others once (evaluated maps the
+        id of an operation to its column).
+        """
+        kind, argument = operation
+        if kind == "column":
+            return argument
+        if kind == "symbol":
+            return ONES if (block >> argument) & 1 else ZEROS
+        if evaluated is None:
+            evaluated = {}
+        values = []
+        for child in argument:
+            if id(child) not in evaluated:
+                evaluated[id(child)] = self.evaluate(child, block, evaluated)
+            values.append(evaluated[id(child)])
+        if kind == "Not":
+            return ~values[0]
+        if kind == "And":
+            return functools.reduce(operator.and_, values, ONES)
+        if kind == "Or":
+            return functools.reduce(operator.or_, values, ZEROS)
+        if kind == "Implication":
+            return ~values[0] | values[1]
+        if kind == "Biconditional":
+            return ~(values[0] ^ values[1])
+        raise TypeError("must be a logical sentence")
+
+
+def table_check(knowledge, query, block_bits=BLOCK_BITS):
+    """
+    Checks if knowledge base entails query with a truth table, returning
+    (entailed, models, counterexamples) as TruthTable.check does.
+    """
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    return TruthTable(symbols, block_bits).check(knowledge, query)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,17 @@
 import itertools
+import math
 import random
+import time
+
+# Cells in a component above which make_random_move samples assignments
+# of mines instead of enumerating them all
+COMPONENT_LIMIT = 20
+
+# Seconds make_random_move may spend on the probabilities of mines
+TIME_BUDGET = 0.1
+
+# Backtracking steps between checks of the time budget
+CHECK_EVERY = 256
 
 
 class Minesweeper():
@@ -101,6 +113,12 @@ class Sentence():
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
+    def key(self):
+        """
+        Returns a hashable, frozen copy of the sentence.
+        """
+        return (frozenset(self.cells), self.count)
+
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
@@ -141,11 +159,12 @@ class Sentence():
 
 class MinesweeperAI():
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=8):
 
-        # Set initial height and width
+        # Set initial height and width, and the number of mines in the game
         self.height = height
         self.width = width
+        self.total_mines = mines
 
         # Keep track of which cells have been clicked on
         self.moves_made = set()
@@ -154,8 +173,37 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Sentences about the game known to be true, by their frozen key
+        self.knowledge = {}
+
+        # Keys of the sentences that mention each cell, so marking a cell
+        # only touches those
+        self.sentences = {}
+
+        # Keys of the sentences added or changed since inference last
+        # looked at them
+        self.worklist = []
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge, unless it has no cells left
+        or is already known, and queues it for inference.
+        """
+        key = sentence.key()
+        if not sentence.cells or key in self.knowledge:
+            return
+        self.knowledge[key] = sentence
+        for cell in sentence.cells:
+            self.sentences.setdefault(cell, set()).add(key)
+        self.worklist.append(key)
+
+    def remove_sentence(self, key):
+        """
+        Removes a sentence from the knowledge, returning it.
+        """
+        for cell in key[0]:
+            self.sentences[cell].discard(key)
+        return self.knowledge.pop(key)
 
     def mark_mine(self, cell):
         """
@@ -163,8 +211,11 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
+        for key in list(self.sentences.get(cell, ())):
+            sentence = self.remove_sentence(key)
             sentence.mark_mine(cell)
+            self.add_sentence(sentence)
+        self.sentences.pop(cell, None)
 
     def mark_safe(self, cell):
         """
@@ -172,8 +223,11 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
+        for key in list(self.sentences.get(cell, ())):
+            sentence = self.remove_sentence(key)
             sentence.mark_safe(cell)
+            self.add_sentence(sentence)
+        self.sentences.pop(cell, None)
 
     def add_knowledge(self, cell, count):
 
@@ -197,45 +251,48 @@ class MinesweeperAI():
                 # if its within the borders add it to the undetermined cells
                 if 0 <= i < self.height and 0 <= j < self.width:
                     neighbors.add((i, j))
-        self.knowledge.append(Sentence(neighbors, count))
+        self.add_sentence(Sentence(neighbors, count))
+        self.infer()
 
-        # Check if one of the sentences in the AI's KB, is an all safes or a mines sentence
-        # if so, mark them as such
-        for sentence in self.knowledge:
+    def infer(self):
+        """
+        Draws conclusions from the queued sentences until there are none
+        left: marks the cells of a sentence that are all safes or all
+        mines, and otherwise infers new sentences from the sentences
+        that are a subset or a superset of it. Every change queues the
+        sentences it touches, so this runs until no new facts appear.
+        """
+        while self.worklist:
+            key = self.worklist.pop()
+            sentence = self.knowledge.get(key)
+            if sentence is None:
+                continue
+
+            # Check if the sentence is an all safes or a mines sentence
+            # if so, mark them as such
             if sentence.known_safes():
-                for cells in sentence.known_safes().copy():
-                    self.mark_safe(cells)
+                for cell in sentence.known_safes().copy():
+                    self.mark_safe(cell)
+                continue
             if sentence.known_mines():
-                for cells in sentence.known_mines().copy():
-                    self.mark_mine(cells)
-
-        # Check if any of the sentences are a second_sentence of anohter sentence to infer new sentences from them
-        # for first_sentence in self.knowledge:
-        #     for second_sentence in self.knowledge:
-        #         if first_sentence is second_sentence:
-        #             continue
-        #         if first_sentence == second_sentence:
-        #             self.knowledge.remove(second_sentence)
-        #         elif first_sentence.cells.issecond_sentence(second_sentence.cells):
-        #             new_sentence = Sentence(
-        #                 second_sentence.cells - first_sentence.cells,
-        #                  second_sentence.count - first_sentence.count)
-        #             if new_sentence not in self.knowledge:
-        #                 self.knowledge.append(new_sentence)
-
-        knowledge_copied = self.knowledge.copy()
-        while knowledge_copied:
-            first_sentence = knowledge_copied.pop()
-            first_set = first_sentence.cells
-            first_count = first_sentence.count
-            for second_sentence in knowledge_copied:
-                second_set = second_sentence.cells
-                second_count = second_sentence.count
-                if first_set.issubset(second_set):
-                    new_sentence = Sentence(
-                        second_set - first_set, second_count - first_count)
-                    if new_sentence not in self.knowledge:
-                        self.knowledge.append(new_sentence)
+                for cell in sentence.known_mines().copy():
+                    self.mark_mine(cell)
+                continue
+
+            # a subset or superset shares cells with the sentence, so only
+            # the sentences indexed under its cells need comparing
+            cells, count = key
+            related = set()
+            for cell in cells:
+                related.update(self.sentences[cell])
+            related.discard(key)
+            for other_cells, other_count in related:
+                if cells < other_cells:
+                    self.add_sentence(
+                        Sentence(other_cells - cells, other_count - count))
+                elif other_cells < cells:
+                    self.add_sentence(
+                        Sentence(cells - other_cells, count - other_count))
 
     def make_safe_move(self):
         for move in self.safes:
@@ -244,8 +301,205 @@ class MinesweeperAI():
         return None
 
     def make_random_move(self):
-        for i in range(self.height):
-            for j in range(self.width):
-                if (i, j) not in self.mines and (i, j) not in self.moves_made:
-                    return (i, j)
-        return None
+        """
+        Returns the cell least likely to be a mine among those not yet
+        chosen and not known to be mines, or None if there are none.
+        """
+        probabilities = self.mine_probabilities()
+        if not probabilities:
+            return None
+        return min(probabilities, key=lambda cell: (probabilities[cell], cell))
+
+    def mine_probabilities(self):
+        """
+        Returns a dictionary mapping every cell not yet chosen and not
+        known to be a mine to the probability that it is a mine.
+
+        The cells of the sentences split into components that share no
+        sentence, and the assignments of mines to each component are
+        counted by their number of mines. Combined assignments with k
+        mines leave the rest of the mines to the cells no sentence is
+        about, so they are weighted by the ways to place those there.
+        """
+        deadline = time.perf_counter() + TIME_BUDGET
+        components = self.components()
+        assignments = []
+        for i, component in enumerate(components):
+            # share what is left of the time between the components left
+            now = time.perf_counter()
+            share = now + max(0, deadline - now) / (len(components) - i)
+            assignments.append(self.count_assignments(component, share))
+
+        # a component with no assignment found in time counts as cells no
+        # sentence is about
+        kept = [i for i, (counts, _) in enumerate(assignments) if counts]
+        components = [components[i] for i in kept]
+        assignments = [assignments[i] for i in kept]
+
+        frontier = {cell for component in components for cell in component}
+        rest = [(i, j) for i in range(self.height) for j in range(self.width)
+                if (i, j) not in self.moves_made and (i, j) not in self.mines
+                and (i, j) not in self.safes and (i, j) not in frontier]
+        left = self.total_mines - len(self.mines)
+        weights = [math.comb(len(rest), left - k) if k <= left else 0
+                   for k in range(len(frontier) + 1)]
+
+        ways = {0: 1}
+        for counts, _ in assignments:
+            ways = convolve(ways, counts)
+        total = sum(ways[k] * weights[k] for k in ways)
+        if total == 0:
+            # the number of mines does not fit the knowledge, so the AI was
+            # not told the right one: count every assignment the same
+            weights = [1] * (len(frontier) + 1)
+            total = sum(ways.values())
+
+        probabilities = {cell: 0 for cell in self.safes - self.moves_made}
+        for i, (counts, mines) in enumerate(assignments):
+            others = {0: 1}
+            for j, (other_counts, _) in enumerate(assignments):
+                if j != i:
+                    others = convolve(others, other_counts)
+            for k in counts:
+                factor = sum(ways * weights[k + other]
+                             for other, ways in others.items())
+                for cell, count in mines[k].items():
+                    probabilities[cell] = probabilities.get(cell, 0) + count * factor
+            for cell in components[i]:
+                probabilities[cell] = probabilities.get(cell, 0) / total
+        if rest:
+            expected = sum(ways[k] * weights[k] * (left - k) for k in ways)
+            for cell in rest:
+                probabilities[cell] = min(1, max(0, expected / total / len(rest)))
+        return probabilities
+
+    def components(self):
+        """
+        Returns the cells of the sentences split into lists of cells that
+        share no sentence, each in the order a search meets them.
+        """
+        seen = set()
+        components = []
+        for start, keys in self.sentences.items():
+            if start in seen or not keys:
+                continue
+            seen.add(start)
+            component = [start]
+            for cell in component:
+                for key in self.sentences[cell]:
+                    for other in self.knowledge[key].cells:
+                        if other not in seen:
+                            seen.add(other)
+                            component.append(other)
+            components.append(component)
+        return components
+
+    def count_assignments(self, cells, deadline):
+        """
+        Returns (counts, mines) for the assignments of mines to a component
+        consistent with the sentences about it: counts maps a number of
+        mines to the number of assignments with that many, and mines maps
+        it to how many of those make each cell a mine.
+
+        Up to COMPONENT_LIMIT cells, backtracking enumerates every
+        assignment, stopping early only past the deadline. Larger
+        components are sampled instead: backtracking with random choices
+        finds one assignment at a time until the deadline, and each
+        distinct one is counted once.
+        """
+        keys = list({key for cell in cells for key in self.sentences[cell]})
+        need = [count for _, count in keys]
+        free = [len(self.knowledge[key].cells) for key in keys]
+        constraints = {cell: [] for cell in cells}
+        for index, key in enumerate(keys):
+            for cell in self.knowledge[key].cells:
+                constraints[cell].append(index)
+
+        sample = len(cells) > COMPONENT_LIMIT
+        counts = {}
+        mines = {}
+        mined = []
+        found = set()
+
+        def record():
+            if sample:
+                assignment = frozenset(mined)
+                if assignment in found:
+                    return
+                found.add(assignment)
+            k = len(mined)
+            counts[k] = counts.get(k, 0) + 1
+            mines.setdefault(k, {})
+            for cell in mined:
+                mines[k][cell] = mines[k].get(cell, 0) + 1
+
+        def assign(cell, value):
+            # gives a cell a value if that keeps every sentence satisfiable
+            for constraint in constraints[cell]:
+                need[constraint] -= value
+                free[constraint] -= 1
+            if value:
+                mined.append(cell)
+            if any(need[constraint] < 0 or need[constraint] > free[constraint]
+                   for constraint in constraints[cell]):
+                unassign(cell, value)
+                return False
+            return True
+
+        def unassign(cell, value):
+            for constraint in constraints[cell]:
+                need[constraint] += value
+                free[constraint] += 1
+            if value:
+                mined.pop()
+
+        def values():
+            return random.sample([0, 1], 2) if sample else [1, 0]
+
+        def search():
+            # depth-first with an explicit stack of the (index, value)
+            # choices left to try, cells[i] having value assigned[i]; returns
+            # True once the search should stop, past the deadline or after
+            # one assignment when sampling
+            stack = [(0, value) for value in values()]
+            assigned = []
+            nodes = 0
+            stop = False
+            while stack:
+                index, value = stack.pop()
+                while len(assigned) > index:
+                    unassign(cells[len(assigned) - 1], assigned.pop())
+                nodes += 1
+                if nodes % CHECK_EVERY == 0 and time.perf_counter() > deadline:
+                    stop = True
+                    break
+                if not assign(cells[index], value):
+                    continue
+                assigned.append(value)
+                if index + 1 < len(cells):
+                    stack.extend((index + 1, value) for value in values())
+                    continue
+                record()
+                if sample or time.perf_counter() > deadline:
+                    stop = True
+                    break
+            while assigned:
+                unassign(cells[len(assigned) - 1], assigned.pop())
+            return stop
+
+        search()
+        while sample and time.perf_counter() < deadline:
+            search()
+        return counts, mines
+
+
+def convolve(first, second):
+    """
+    Returns the counts of combined assignments by number of mines, given
+    the counts of assignments of two components by number of mines.
+    """
+    combined = {}
+    for i, first_count in first.items():
+        for j, second_count in second.items():
+            combined[i + j] = combined.get(i + j, 0) + first_count * second_count
+    return combined
@@ -0,0 +1,109 @@
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+# Percentiles reported for the latency of each call
+PERCENTILES = [50, 90, 99]
+
+
+def main():
+    if len(sys.argv) not in range(4, 7):
+        sys.exit("Usage: python simulate.py height width mines|density [games] [workers]")
+    height, width = int(sys.argv[1]), int(sys.argv[2])
+
+    # a mine count, or a fraction of the cells that are mines
+    if "." in sys.argv[3]:
+        mines = round(float(sys.argv[3]) * height * width)
+    else:
+        mines = int(sys.argv[3])
+    games = int(sys.argv[4]) if len(sys.argv) > 4 else 1000
+    workers = int(sys.argv[5]) if len(sys.argv) > 5 else None
+
+    print(json.dumps(simulate(height, width, mines, games, workers), indent=4))
+
+
+def simulate(height, width, mines, games, workers=None):
+    """
+    Plays games seeded 0 to games - 1 across a pool of worker processes,
+    returning a dictionary of the results: the win rate, the moves per
+    game, and the latency of add_knowledge and of choosing a move.
+    """
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.map(play, [(height, width, mines, seed)
+                                  for seed in range(games)])
+
+    wins = sum(won for won, _, _, _ in results)
+    moves = [len(knowledge) for _, knowledge, _, _ in results]
+    return {
+        "height": height,
+        "width": width,
+        "mines": mines,
+        "games": games,
+        "wins": wins,
+        "win_rate": wins / games,
+        "moves_per_game": sum(moves) / games,
+        "random_moves_per_game": sum(guesses for _, _, _, guesses in results) / games,
+        "add_knowledge_ms": latencies(
+            [seconds for _, knowledge, _, _ in results for seconds in knowledge]),
+        "choose_move_ms": latencies(
+            [seconds for _, _, choices, _ in results for seconds in choices]),
+        "seconds": time.perf_counter() - start
+    }
+
+
+def play(game):
+    """
+    Plays one seeded game, returning (won, knowledge, choices, guesses):
+    whether the AI won, the seconds each call of add_knowledge and of
+    choosing a move took, and how many moves were not known to be safe.
+    """
+    height, width, mines, seed = game
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(height=height, width=width, mines=mines)
+    knowledge = []
+    choices = []
+    guesses = 0
+    # the game is won once every safe cell is revealed
+    while len(ai.moves_made) < height * width - mines:
+        start = time.perf_counter()
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+            guesses += 1
+        choices.append(time.perf_counter() - start)
+
+        # and lost on a mine
+        if move is None or game.is_mine(move):
+            return False, knowledge, choices, guesses
+
+        start = time.perf_counter()
+        ai.add_knowledge(move, game.nearby_mines(move))
+        knowledge.append(time.perf_counter() - start)
+    return True, knowledge, choices, guesses
+
+
+def latencies(seconds):
+    """
+    Returns the mean, the PERCENTILES and the maximum of a list of
+    latencies in seconds, in milliseconds.
+    """
+    if not seconds:
+        return {}
+    seconds = sorted(seconds)
+    summary = {"mean": sum(seconds) / len(seconds) * 1000}
+    for percentile in PERCENTILES:
+        # nearest rank
+        rank = max(0, -(-percentile * len(seconds) // 100) - 1)
+        summary[f"p{percentile}"] = seconds[rank] * 1000
+    summary["max"] = seconds[-1] * 1000
+    return summary
+
+
+if __name__ == "__main__":
+    main()